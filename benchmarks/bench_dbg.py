@@ -0,0 +1,158 @@
+"""
+Micro benchmarks of dbg() overhead. Run from the repo root with:
+
+    python benchmarks/bench_dbg.py
+"""
+
+import inspect
+import io
+import sys
+import timeit
+
+sys.path.insert(0, ".")
+
+import crab_dbg  # noqa: E402
+import crab_dbg._binary  # noqa: E402
+import crab_dbg._dbg  # noqa: E402
+import crab_dbg._format  # noqa: E402
+import crab_dbg._source  # noqa: E402
+from crab_dbg import dbg  # noqa: E402
+
+
+def _report(name: str, stmt, number: int = 20000) -> float:
+    best = min(timeit.repeat(stmt, number=number, repeat=5)) / number
+    print("%-50s %10.3f us/call" % (name, best * 1e6))
+    return best
+
+
+def bench_frame_introspection() -> None:
+    def _inspect_path():
+        frame = sys._getframe()
+        return inspect.getframeinfo(frame).positions
+
+    def _fast_path():
+        frame = sys._getframe()
+        return crab_dbg._source.get_frame_positions(frame)
+
+    slow = _report("frame positions via inspect.getframeinfo()", _inspect_path)
+    fast = _report("frame positions via co_positions()", _fast_path)
+    print("%-50s %10.1fx" % ("speedup", slow / fast))
+
+
+def bench_dbg_call() -> None:
+    sink = io.StringIO()
+
+    def _no_argument():
+        sink.seek(0)
+        dbg(file=sink)
+
+    def _single_int():
+        sink.seek(0)
+        dbg(1, file=sink)
+
+    def _single_int_cold():
+        # Forget all call sites, so every call pays for introspection, reading and parsing.
+        crab_dbg._dbg._CALL_SITES.clear()
+        sink.seek(0)
+        dbg(1, file=sink)
+
+    _report("dbg()", _no_argument)
+    _report("dbg(1)", _single_int)
+    _report("dbg(1), call site cache cleared every call", _single_int_cold, 2000)
+
+    def _bare_function(*args, sep=" ", end="\n", file=None, flush=False):
+        return args[0] if len(args) == 1 else args
+
+    def _single_int_bare():
+        sink.seek(0)
+        _bare_function(1, file=sink)
+
+    crab_dbg.disable()
+    try:
+        disabled = _report("dbg(1), disabled", _single_int)
+    finally:
+        crab_dbg.enable()
+    bare = _report("bare function(1)", _single_int_bare)
+    print("%-50s %10.1fx" % ("disabled overhead", disabled / bare))
+
+
+class _Point:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+class _NoCache(dict):
+    """Stand-in for the type dispatch cache which never hits, so every value is classified again."""
+
+    def get(self, key, default=None):
+        return default
+
+
+def bench_type_dispatch() -> None:
+    points = [_Point(i, -i) for i in range(100000)]
+
+    def _render():
+        crab_dbg._format.get_human_readable_repr(points)
+
+    cached = _report("render 100k objects", _render, 1)
+    crab_dbg._format._KINDS = _NoCache()
+    try:
+        uncached = _report("render 100k objects, no type dispatch cache", _render, 1)
+    finally:
+        crab_dbg._format._KINDS = {}
+    print("%-50s %10.1fx" % ("speedup", uncached / cached))
+
+
+def bench_binary_records() -> None:
+    tree = {
+        "node_%d" % i: {
+            "point": _Point(i, -i),
+            "tags": ["a", "b", "c"],
+            "weight": i / 3,
+        }
+        for i in range(10000)
+    }
+    shapes = [
+        ("10k nested dicts", tree),
+        ("50k objects", [_Point(i, -i) for i in range(50000)]),
+        ("200k ints", list(range(200000))),
+    ]
+    options = crab_dbg._format.config
+
+    for name, value in shapes:
+
+        def _text():
+            crab_dbg._format.get_human_readable_repr(value, options)
+
+        def _binary():
+            crab_dbg._binary.format_binary_record(
+                "[bench.py:1:1]", ["value"], (value,), options
+            )
+
+        text = _report("render %s as text" % name, _text, 1)
+        binary = _report("record %s as binary" % name, _binary, 1)
+        print("%-50s %10.1fx" % ("speedup", text / binary))
+
+
+def bench_hexdump() -> None:
+    payload = bytes(range(256)) * 16384
+    options = crab_dbg._format.config.override(hexdump=64)
+
+    def _repr():
+        crab_dbg._format.get_human_readable_repr(payload)
+
+    def _hexdump():
+        crab_dbg._format.get_human_readable_repr(payload, options)
+
+    full = _report("render 4 MiB of bytes by repr()", _repr, 5)
+    preview = _report("render 4 MiB of bytes as a 64 byte hexdump", _hexdump)
+    print("%-50s %10.1fx" % ("speedup", full / preview))
+
+
+if __name__ == "__main__":
+    bench_frame_introspection()
+    bench_dbg_call()
+    bench_type_dispatch()
+    bench_binary_records()
+    bench_hexdump()
@@ -1,3 +1,22 @@
-__all__ = ["dbg"]
+__all__ = [
+    "dbg",
+    "configure",
+    "enable",
+    "disable",
+    "is_enabled",
+    "register",
+    "unregister",
+    "source_cache_info",
+    "clear_source_cache",
+    "render_cache_info",
+    "clear_render_cache",
+    "stats",
+    "reset_stats",
+]
 
+from ._config import configure, disable, enable, is_enabled
 from ._dbg import dbg
+from ._format import register, unregister
+from ._memo import clear_render_cache, render_cache_info
+from ._source import clear_source_cache, source_cache_info
+from ._stats import reset_stats, stats
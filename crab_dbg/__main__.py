@@ -0,0 +1,44 @@
+"""
+Command line tools of crab_dbg:
+
+    python -m crab_dbg render crab_dbg.records
+
+renders binary records written with output_format="binary" in the usual text format.
+"""
+
+import argparse
+import struct
+import sys
+
+from ._binary import render_records
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m crab_dbg")
+    commands = parser.add_subparsers(dest="command", required=True)
+    render = commands.add_parser(
+        "render", help="render binary records as text, like dbg() prints them"
+    )
+    render.add_argument("path", help="file written with output_format='binary'")
+
+    args = parser.parse_args(argv)
+    try:
+        with open(args.path, "rb") as f:
+            data = f.read()
+    except OSError as e:
+        print("crab_dbg: %s: %s" % (args.path, e.strerror or e), file=sys.stderr)
+        return 1
+    try:
+        render_records(data, sys.stdout.write)
+    except ValueError as e:
+        print("crab_dbg: %s: %s" % (args.path, e), file=sys.stderr)
+        return 1
+    except (IndexError, struct.error):
+        # Reading past the end of the data, e.g. the file was cut short while it was written.
+        print("crab_dbg: %s: truncated or corrupt records" % args.path, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+"""
+Support for data science libraries: numpy, pytorch, pandas, polars and xarray.
+
+None of them is ever imported by crab_dbg, their types are recognized by module and class name, and a value's own
+methods are used to look into it.
+"""
+
+import sys
+from typing import Any, Callable
+
+
+def array_library(cls: type) -> str | None:
+    """
+    Tell which kind of data science container a class is, e.g. "numpy" or "pandas.Series", or None if it is not one.
+    """
+    # Cannot use isinstance() here as import those large library is too time-consuming.
+    module = cls.__module__
+    name = cls.__name__
+
+    # Check for numpy.ndarray
+    if module == "numpy" and name == "ndarray":
+        return "numpy"
+
+    # Check for PyTorch Tensor, and its subclasses like torch.nn.Parameter.
+    for base in cls.__mro__:
+        if base.__module__ == "torch" and base.__name__ == "Tensor":
+            return "torch"
+
+    # pandas classes are defined in submodules, like pandas.core.frame.DataFrame.
+    if module.startswith("pandas."):
+        if name in ("DataFrame", "Series"):
+            return "pandas." + name
+        if name.endswith("Index"):
+            return "pandas.Index"
+
+    if module.startswith("polars.") and name in ("DataFrame", "Series"):
+        return "polars." + name
+
+    if module.startswith("xarray.") and name in ("DataArray", "Dataset"):
+        return "xarray." + name
+
+    return None
+
+
+def _format_size(nbytes: int) -> str:
+    """Human readable size, like 1.5 KiB."""
+    size = float(nbytes)
+    for unit in ("B", "KiB", "MiB", "GiB", "TiB"):
+        if size < 1024 or unit == "TiB":
+            break
+        size /= 1024
+    if unit == "B":
+        return "%d B" % nbytes
+    return "%.1f %s" % (size, unit)
+
+
+def _format_number(number: Any) -> str:
+    """Format a statistic, numpy and pytorch scalars are turned into python numbers first."""
+    if hasattr(number, "item"):
+        number = number.item()
+    if isinstance(number, float):
+        return "%.6g" % number
+    return str(number)
+
+
+def _format_names(names: list, max_names: int = 10) -> str:
+    """Format a list of column or variable names, only the first few if there are too many."""
+    text = ", ".join(str(name) for name in names[:max_names])
+    if len(names) > max_names:
+        text += ", ... %s more" % format(len(names) - max_names, ",")
+    return "[%s]" % text
+
+
+def _summarize_numpy(array: Any) -> str:
+    parts = [
+        "shape=%s" % (array.shape,),
+        "dtype=%s" % array.dtype,
+        "nbytes=%s" % _format_size(array.nbytes),
+    ]
+    if array.size and array.dtype.kind in "biuf":
+        # Every numpy array's class lives in the numpy module, so it must be imported already.
+        np = sys.modules["numpy"]
+        nan_count = int(np.isnan(array).sum()) if array.dtype.kind == "f" else 0
+        if nan_count == 0:
+            parts.append("min=%s" % _format_number(array.min()))
+            parts.append("max=%s" % _format_number(array.max()))
+            parts.append("mean=%s" % _format_number(array.mean()))
+        elif nan_count < array.size:
+            # The nan* functions copy the array, only pay for that when needed.
+            parts.append("min=%s" % _format_number(np.nanmin(array)))
+            parts.append("max=%s" % _format_number(np.nanmax(array)))
+            parts.append("mean=%s" % _format_number(np.nanmean(array)))
+        if array.dtype.kind == "f":
+            parts.append("nan=%s" % format(nan_count, ","))
+    return "ndarray(%s)" % ", ".join(parts)
+
+
+def tensor_reads_data(tensor: Any, tensor_data: bool | None) -> bool:
+    """
+    Tell if dbg() may look at the data of a pytorch tensor, see the tensor_data option. By default only tensors on
+    the CPU are read, reading a CUDA or MPS tensor waits for the device and copies the tensor to the host.
+    """
+    if tensor_data is not None:
+        return tensor_data
+    return tensor.device.type == "cpu"
+
+
+def summarize_tensor(tensor: Any, read_data: bool = True) -> str:
+    """
+    Summarize a pytorch tensor in one line. Only its metadata is used, unless read_data is True, then basic statistics
+    of its data are included as well.
+    """
+    name = type(tensor).__name__
+    parts = [
+        "shape=%s" % (tuple(tensor.shape),),
+        "dtype=%s" % tensor.dtype,
+        "device=%s" % tensor.device,
+        "requires_grad=%s" % tensor.requires_grad,
+    ]
+    # Sparse tensors have no strides.
+    if str(tensor.layout) == "torch.strided":
+        parts.append("stride=%s" % (tuple(tensor.stride()),))
+    parts.append("nbytes=%s" % _format_size(tensor.element_size() * tensor.nelement()))
+    if read_data and tensor.nelement() and not tensor.is_complex():
+        # Don't record the statistics in the autograd graph.
+        tensor = tensor.detach()
+        if tensor.is_floating_point():
+            nan_mask = tensor.isnan()
+            nan_count = int(nan_mask.sum().item())
+            values = tensor[~nan_mask] if nan_count else tensor
+        else:
+            nan_count = 0
+            values = tensor
+        if values.nelement():
+            parts.append("min=%s" % _format_number(values.min()))
+            parts.append("max=%s" % _format_number(values.max()))
+            # Accumulated in float64, without a float64 copy of the data.
+            float64 = sys.modules["torch"].float64
+            parts.append("mean=%s" % _format_number(values.mean(dtype=float64)))
+        if tensor.is_floating_point():
+            parts.append("nan=%s" % format(nan_count, ","))
+    return "%s(%s)" % (name, ", ".join(parts))
+
+
+def _summarize_pandas_data_frame(df: Any) -> str:
+    columns = ["%s: %s" % (name, dtype) for name, dtype in df.dtypes.items()]
+    return "DataFrame(shape=%s, columns=%s, memory=%s)" % (
+        df.shape,
+        _format_names(columns),
+        _format_size(int(df.memory_usage(index=True, deep=False).sum())),
+    )
+
+
+def _summarize_pandas_series(series: Any) -> str:
+    parts = [
+        "name=%s" % (series.name,),
+        "length=%s" % format(len(series), ","),
+        "dtype=%s" % series.dtype,
+        "memory=%s" % _format_size(int(series.memory_usage(index=True, deep=False))),
+    ]
+    if len(series) and series.dtype.kind in "biuf":
+        parts.append("min=%s" % _format_number(series.min()))
+        parts.append("max=%s" % _format_number(series.max()))
+        parts.append("mean=%s" % _format_number(series.mean()))
+        parts.append("nan=%s" % format(int(series.isna().sum()), ","))
+    return "Series(%s)" % ", ".join(parts)
+
+
+def _summarize_pandas_index(index: Any) -> str:
+    return "%s(name=%s, length=%s, dtype=%s)" % (
+        type(index).__name__,
+        index.name,
+        format(len(index), ","),
+        index.dtype,
+    )
+
+
+def _summarize_polars_data_frame(df: Any) -> str:
+    columns = ["%s: %s" % (name, dtype) for name, dtype in df.schema.items()]
+    return "DataFrame(shape=%s, columns=%s, memory=%s)" % (
+        df.shape,
+        _format_names(columns),
+        _format_size(int(df.estimated_size())),
+    )
+
+
+def _summarize_polars_series(series: Any) -> str:
+    parts = [
+        "name=%s" % (series.name,),
+        "length=%s" % format(len(series), ","),
+        "dtype=%s" % series.dtype,
+        "memory=%s" % _format_size(int(series.estimated_size())),
+        "null=%s" % format(series.null_count(), ","),
+    ]
+    if len(series) > series.null_count() and series.dtype.is_numeric():
+        parts.append("min=%s" % _format_number(series.min()))
+        parts.append("max=%s" % _format_number(series.max()))
+        parts.append("mean=%s" % _format_number(series.mean()))
+    return "Series(%s)" % ", ".join(parts)
+
+
+def _summarize_xarray_data_array(array: Any) -> str:
+    return "DataArray(name=%s, sizes=%s, dtype=%s, nbytes=%s)" % (
+        array.name,
+        dict(array.sizes),
+        array.dtype,
+        _format_size(array.nbytes),
+    )
+
+
+def _summarize_xarray_dataset(dataset: Any) -> str:
+    return "Dataset(sizes=%s, data_vars=%s, nbytes=%s)" % (
+        dict(dataset.sizes),
+        _format_names(list(dataset.data_vars)),
+        _format_size(dataset.nbytes),
+    )
+
+
+# array_library() -> function summarizing a value in one line, without rendering all its data.
+SUMMARIZERS: dict[str, Callable[[Any], str]] = {
+    "numpy": _summarize_numpy,
+    "torch": summarize_tensor,
+    "pandas.DataFrame": _summarize_pandas_data_frame,
+    "pandas.Series": _summarize_pandas_series,
+    "pandas.Index": _summarize_pandas_index,
+    "polars.DataFrame": _summarize_polars_data_frame,
+    "polars.Series": _summarize_polars_series,
+    "xarray.DataArray": _summarize_xarray_data_array,
+    "xarray.Dataset": _summarize_xarray_dataset,
+}
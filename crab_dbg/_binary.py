@@ -0,0 +1,711 @@
+"""
+Binary records, see the "binary" output_format.
+
+Instead of rendering values to indented text, dbg() records their structure in a compact binary form, appended to a
+file. `python -m crab_dbg render <file>` turns the records into the usual text later, see render_records().
+
+A file starts with MAGIC, followed by records. A record is its size as a varint, then:
+
+    location (str), max_items (varint), max_depth (varint), preview_items (varint), flags (varint), number of
+    arguments (varint), and for each argument: expression (str), value
+
+where a str is its utf-8 size times 2 as a varint followed by its utf-8 bytes, or, if the same string has already
+been written in this record, its index among the strings of the record times 2 plus 1. max_items, max_depth and
+preview_items are stored plus one, so 0 means None. Bit 0 of flags is the dedup option. A value is a one byte tag
+followed by:
+
+    _NONE, _TRUE, _FALSE: nothing
+    _INT: the zigzag encoded value as a varint
+    _FLOAT: 8 bytes, little endian double
+    _STR, _BYTES, _TEXT_LEAF, _BLOCK: str, or the raw bytes for _BYTES
+    _LIST_TAG, _TUPLE_TAG, _SET_TAG: length (varint), number of items recorded (varint), items
+    _DICT_TAG: length, number of items recorded, (key text (str), value) pairs
+    _OBJECT_TAG: class name (str), number of fields, number of fields recorded, (field name (str), value) pairs
+    _REF: one byte, the kind of container already being recorded, i.e. a cyclic reference
+    _ITERABLE_TAG: type name (str), flags (varint), length (varint, only if bit 1 of flags is set, i.e. the length is
+        known), number of items recorded, items, or (key text (str), value) pairs if bit 0 of flags is set
+    _ALIAS_TAG: index (varint) of a container already recorded in this record, counting all containers of all its
+        values in the order they are recorded. Only written when dedup is on, so rendering finds the same containers
+        shared, also across the arguments of a call.
+
+Items beyond max_items, and containers nested deeper than max_depth, are not recorded, just counted. Rendering applies
+the same limits, so they are summarized exactly as dbg() would have.
+"""
+
+import atexit
+from itertools import islice
+import struct
+from typing import Any, BinaryIO, Iterator
+
+from ._arrays import summarize_tensor, tensor_reads_data
+from ._config import Options
+from ._buffers import format_hexdump
+from ._format import (
+    _ARRAY,
+    _BUFFER,
+    _DICT,
+    _ITERABLE,
+    _LIST,
+    _OBJECT,
+    _SET,
+    _SIMPLE,
+    _TENSOR,
+    _TEXT,
+    _TUPLE,
+    _WRITTEN,
+    _REPR_DISPATCH,
+    STAND_INS,
+    _get_dispatch,
+    _truncated_text,
+    render_human_readable_repr,
+    shared_references,
+)
+from ._iterables import preview_limit
+from ._output import WRITE_LOCK
+
+MAGIC = b"CRABDBG\x01"
+
+_NONE = 0
+_TRUE = 1
+_FALSE = 2
+_INT = 3
+_FLOAT = 4
+_STR = 5
+_BYTES = 6
+_TEXT_LEAF = 7  # Text rendered at the call site, by repr(), str() or a formatter.
+_BLOCK = 8  # Like _TEXT_LEAF, but rendered as a block, like numpy arrays.
+_LIST_TAG = 9
+_TUPLE_TAG = 10
+_SET_TAG = 11
+_DICT_TAG = 12
+_OBJECT_TAG = 13
+_REF = 14
+_ALIAS_TAG = 15
+_ITERABLE_TAG = 16
+
+# Flags of _ITERABLE_TAG.
+_PAIRS = 1
+_LENGTH_KNOWN = 2
+
+_CONTAINER_TAGS = {
+    _LIST: _LIST_TAG,
+    _TUPLE: _TUPLE_TAG,
+    _SET: _SET_TAG,
+    _DICT: _DICT_TAG,
+}
+
+_DOUBLE = struct.Struct("<d")
+
+# Marks that there is no value waiting to be recorded.
+_NOTHING = object()
+
+# Types recorded in their own form without looking up how they are rendered, unless a formatter is registered for them.
+_INLINE_TYPES = (int, float, str, type(None))
+
+
+def _write_varint(out: bytearray, number: int) -> None:
+    while number > 0x7F:
+        out.append((number & 0x7F) | 0x80)
+        number >>= 7
+    out.append(number)
+
+
+def _write_int(out: bytearray, value: int) -> None:
+    """Write an int, zigzag encoded, with its tag. Most ints take one or two bytes, which are written without a loop."""
+    out.append(_INT)
+    number = value << 1 if value >= 0 else (-value << 1) - 1
+    if number < 0x80:
+        out.append(number)
+    elif number < 0x4000:
+        out.append(number & 0x7F | 0x80)
+        out.append(number >> 7)
+    else:
+        _write_varint(out, number)
+
+
+class _RecordWriter:
+    """
+    Writes one record into a buffer. Every distinct string is written once, later occurrences refer to it, so field
+    names and dict keys repeated all over a value cost a byte or two each.
+    """
+
+    __slots__ = (
+        "out",
+        "strings",
+        "field_headers",
+        "recorded_containers",
+        "container_count",
+    )
+
+    def __init__(self, dedup: bool):
+        self.out = bytearray()
+        self.strings: dict[str, int] = {}
+        # label -> header referring to the field name written for it, e.g. "x: " -> the index of "x" times 2 plus 1.
+        self.field_headers: dict[str, int] = {}
+        # id -> index of the containers recorded so far, if dedup is on. Collapsed ones can't be referred to.
+        self.recorded_containers: dict[int, int] | None = {} if dedup else None
+        # All containers recorded so far, collapsed ones included.
+        self.container_count = 0
+
+    def varint(self, number: int) -> None:
+        _write_varint(self.out, number)
+
+    def str(self, string: str) -> None:
+        index = self.strings.get(string)
+        if index is not None:
+            header = index << 1 | 1
+            if header < 0x80:
+                self.out.append(header)
+            else:
+                _write_varint(self.out, header)
+            return
+        self.strings[string] = len(self.strings)
+        # Strings may hold lone surrogates, e.g. file names decoded with surrogateescape.
+        data = string.encode("utf-8", "surrogatepass")
+        _write_varint(self.out, len(data) << 1)
+        self.out += data
+
+    def field_name(self, label: str) -> None:
+        """Write the name of a field given its label, like "name: ", the first time the label is seen."""
+        name = label[:-2]
+        self.str(name)
+        self.field_headers[label] = self.strings[name] << 1 | 1
+
+    def leaf(self, tag: int, text: str) -> None:
+        self.out.append(tag)
+        self.str(text)
+
+    def limit(self, limit: int | None) -> None:
+        _write_varint(self.out, 0 if limit is None else limit + 1)
+
+    def simple(self, value: Any) -> None:
+        """Record a value of one of _SIMPLE_TYPES, in its own form if possible, so no repr() is needed."""
+        out = self.out
+        cls = type(value)
+        if cls is int:
+            _write_int(out, value)
+        elif cls is str:
+            out.append(_STR)
+            self.str(value)
+        elif cls is float:
+            out.append(_FLOAT)
+            out += _DOUBLE.pack(value)
+        elif value is None:
+            out.append(_NONE)
+        elif cls is bool:
+            out.append(_TRUE if value else _FALSE)
+        elif cls is bytes:
+            out.append(_BYTES)
+            _write_varint(out, len(value))
+            out += value
+        else:
+            self.leaf(_TEXT_LEAF, repr(value))
+
+    def value(self, obj: Any, options: Options) -> None:
+        """
+        Record a value. Mirrors render_human_readable_repr(): the same types are containers, the same limits apply,
+        and leaves are turned into the same text, only nothing gets indented or joined.
+        """
+        max_items = options.max_items
+        max_depth = options.max_depth
+        max_string = options.max_string
+        array_summary = options.array_summary
+        tensor_data = options.tensor_data
+        limit = preview_limit(options)
+        previews = options.preview_items is not None
+        hexdump = options.hexdump
+        get_dispatch = _get_dispatch
+        out = self.out
+        write_int = _write_int
+        write_str = self.str
+        write_leaf = self.leaf
+        write_simple = self.simple
+        write_field_name = self.field_name
+        field_headers = self.field_headers
+        pack_double = _DOUBLE.pack
+        # The common leaves are recorded right away, without looking up how their type is rendered.
+        inline = max_string is None and all(
+            get_dispatch(cls)[0] == _SIMPLE for cls in _INLINE_TYPES
+        )
+
+        recursion_path: set[int] = set()
+        # (entries, kind, level, id) of the containers being recorded, the last one is also kept in the frame_* locals.
+        stack: list[tuple[Iterator, int, int, int]] = []
+        frame_entries: Iterator = iter(())
+        frame_kind = frame_level = frame_id = 0
+
+        recorded_containers = self.recorded_containers
+        container_count = self.container_count
+
+        value, level = obj, 0
+        while True:
+            if value is not _NOTHING:
+                cls = type(value)
+                if cls is int and inline:
+                    write_int(out, value)
+                elif cls is str and inline:
+                    out.append(_STR)
+                    write_str(value)
+                elif cls is float and inline:
+                    out.append(_FLOAT)
+                    out += pack_double(value)
+                elif value is None and inline:
+                    out.append(_NONE)
+                else:
+                    entries = None
+                    dispatch = get_dispatch(cls)
+                    kind = dispatch[0]
+
+                    if kind == _BUFFER:
+                        if hexdump is not None:
+                            write_leaf(
+                                _TEXT_LEAF,
+                                format_hexdump(value, hexdump, options.checksum),
+                            )
+                            kind = _WRITTEN
+                        elif cls is memoryview and previews:
+                            kind = _ITERABLE
+                        else:
+                            kind = _SIMPLE
+                    elif kind == _ITERABLE and not previews:
+                        dispatch = _REPR_DISPATCH
+                        kind = _TEXT
+
+                    if kind == _WRITTEN:
+                        pass
+                    elif kind == _SIMPLE:
+                        if max_string is None:
+                            write_simple(value)
+                        else:
+                            write_leaf(
+                                _TEXT_LEAF, _truncated_text(value, repr, max_string)
+                            )
+                    elif kind == _TEXT:
+                        write_leaf(
+                            _TEXT_LEAF, _truncated_text(value, dispatch[1], max_string)
+                        )
+                    elif kind == _ARRAY or kind == _TENSOR:
+                        if kind == _TENSOR and not tensor_reads_data(
+                            value, tensor_data
+                        ):
+                            write_leaf(
+                                _TEXT_LEAF, summarize_tensor(value, read_data=False)
+                            )
+                        elif array_summary and dispatch[2] is not None:
+                            write_leaf(_TEXT_LEAF, dispatch[2](value))
+                        else:
+                            write_leaf(
+                                _BLOCK, _truncated_text(value, dispatch[1], max_string)
+                            )
+                    elif id(value) in recursion_path:
+                        out.append(_REF)
+                        out.append(kind)
+                    elif (
+                        recorded_containers
+                        and id(value) in recorded_containers
+                        and (max_depth is None or level < max_depth)
+                    ):
+                        out.append(_ALIAS_TAG)
+                        _write_varint(out, recorded_containers[id(value)])
+                    else:
+                        if recorded_containers is not None and (
+                            max_depth is None or level < max_depth
+                        ):
+                            recorded_containers[id(value)] = container_count
+                        container_count += 1
+                        if kind == _ITERABLE:
+                            name, fields, count, pairs = dispatch[1](value)
+                            out.append(_ITERABLE_TAG)
+                            write_str(name)
+                            if max_depth is not None and level >= max_depth:
+                                fields = ()
+                            elif limit is not None:
+                                fields = islice(fields, limit)
+                            # Bounded by the limit, or the length when it is known.
+                            fields = list(fields)
+                            flags = _PAIRS if pairs else 0
+                            if count is not None:
+                                flags |= _LENGTH_KNOWN
+                            _write_varint(out, flags)
+                            if count is not None:
+                                _write_varint(out, count)
+                            _write_varint(out, len(fields))
+                            if fields:
+                                entries = iter(fields)
+                            # Entries of dict_items are recorded like those of a dict.
+                            kind = _DICT if pairs else _LIST
+                        else:
+                            if kind == _OBJECT:
+                                fields = dispatch[1](value)
+                                out.append(_OBJECT_TAG)
+                                write_str(cls.__name__)
+                                count = len(fields)
+                            else:
+                                fields = value.items() if kind == _DICT else value
+                                out.append(_CONTAINER_TAGS[kind])
+                                count = len(value)
+                            if max_depth is not None and level >= max_depth:
+                                # Collapsed, only the count is rendered.
+                                recorded = 0
+                            else:
+                                recorded = (
+                                    count
+                                    if max_items is None
+                                    else min(count, max_items)
+                                )
+                            if count < 0x80:
+                                out.append(count)
+                                out.append(recorded)
+                            else:
+                                _write_varint(out, count)
+                                _write_varint(out, recorded)
+                            if recorded:
+                                entries = (
+                                    iter(fields)
+                                    if recorded == count
+                                    else islice(fields, recorded)
+                                )
+
+                    if entries is not None:
+                        frame_entries = entries
+                        frame_kind = kind
+                        frame_level = level
+                        frame_id = id(value)
+                        recursion_path.add(frame_id)
+                        stack.append((entries, kind, level, frame_id))
+
+            if not stack:
+                self.container_count = container_count
+                return
+
+            entry = next(frame_entries, _NOTHING)
+            if frame_kind <= _SET and inline:
+                # Runs of ints and strs in lists, tuples and sets are recorded without going around the main loop.
+                cls = type(entry)
+                while cls is int or cls is str:
+                    if cls is int:
+                        write_int(out, entry)
+                    else:
+                        out.append(_STR)
+                        write_str(entry)
+                    entry = next(frame_entries, _NOTHING)
+                    cls = type(entry)
+            if entry is _NOTHING:
+                recursion_path.remove(frame_id)
+                stack.pop()
+                if stack:
+                    frame_entries, frame_kind, frame_level, frame_id = stack[-1]
+                value = _NOTHING
+                continue
+
+            if frame_kind == _DICT:
+                key = entry[0]
+                if type(key) is not str:
+                    key = "%s" % (key,)
+                write_str(key)
+                value = entry[1]
+            elif frame_kind == _OBJECT:
+                header = field_headers.get(entry[0])
+                if header is None:
+                    write_field_name(entry[0])
+                elif header < 0x80:
+                    out.append(header)
+                else:
+                    _write_varint(out, header)
+                value = entry[1]
+            else:
+                value = entry
+            level = frame_level + 1
+
+
+def format_binary_record(
+    location: str, raw_args: list[str], evaluated_args: tuple, options: Options
+) -> bytes:
+    """Record one dbg() call, see the module docstring for the layout."""
+    writer = _RecordWriter(options.dedup)
+    writer.str(location)
+    writer.limit(options.max_items)
+    writer.limit(options.max_depth)
+    writer.limit(options.preview_items)
+    writer.varint(1 if options.dedup else 0)
+    writer.varint(len(raw_args))
+    for raw_arg, evaluated_arg in zip(raw_args, evaluated_args):
+        writer.str(raw_arg)
+        writer.value(evaluated_arg, options)
+
+    record = bytearray()
+    _write_varint(record, len(writer.out))
+    record += writer.out
+    return bytes(record)
+
+
+# path -> file opened for appending, kept open as long as the process runs.
+_RECORD_FILES: dict[str, BinaryIO] = {}
+
+
+def append_record(path: str, record: bytes, flush: bool) -> None:
+    """Append a record to a file, which is created, starting with MAGIC, if needed."""
+    with WRITE_LOCK:
+        file = _RECORD_FILES.get(path)
+        if file is None:
+            if not _RECORD_FILES:
+                atexit.register(close_record_files)
+            file = _RECORD_FILES[path] = open(path, "ab")
+            if file.tell() == 0:
+                file.write(MAGIC)
+        file.write(record)
+        if flush:
+            file.flush()
+
+
+def close_record_files() -> None:
+    with WRITE_LOCK:
+        for file in _RECORD_FILES.values():
+            file.close()
+        _RECORD_FILES.clear()
+
+
+class _Reader:
+    __slots__ = ("data", "pos", "strings", "containers")
+
+    def __init__(self, data: bytes, pos: int = 0):
+        self.data = data
+        self.pos = pos
+        # Strings read so far in the current record.
+        self.strings: list[str] = []
+        # Containers of the current record, in the order they were recorded. None while being rebuilt.
+        self.containers: list[Any] = []
+
+    def byte(self) -> int:
+        self.pos += 1
+        return self.data[self.pos - 1]
+
+    def varint(self) -> int:
+        number = 0
+        shift = 0
+        while True:
+            byte = self.data[self.pos]
+            self.pos += 1
+            number |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return number
+            shift += 7
+
+    def raw(self, size: int) -> bytes:
+        self.pos += size
+        if self.pos > len(self.data):
+            raise ValueError("Truncated record")
+        return self.data[self.pos - size : self.pos]
+
+    def str(self) -> str:
+        header = self.varint()
+        if header & 1:
+            return self.strings[header >> 1]
+        string = self.raw(header >> 1).decode("utf-8", "surrogatepass")
+        self.strings.append(string)
+        return string
+
+    def limit(self) -> int | None:
+        limit = self.varint()
+        return None if limit == 0 else limit - 1
+
+
+# Values rebuilt from records. Containers remember their original length, as some of their items may not have been
+# recorded. The renderer only ever iterates the recorded ones.
+
+
+class _Leaf:
+    __slots__ = ("text",)
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _BlockLeaf(_Leaf):
+    __slots__ = ()
+
+
+class _Key(_Leaf):
+    """A key of a dict, rendered as "%s" % key."""
+
+    __slots__ = ()
+
+    def __str__(self):
+        return self.text
+
+
+class _List(list):
+    def __len__(self):
+        return self.length
+
+
+class _Tuple(tuple):
+    def __len__(self):
+        return self.length
+
+
+class _Set(list):
+    """A set's items, in the order they were recorded."""
+
+    def __len__(self):
+        return self.length
+
+
+class _Dict(dict):
+    def __len__(self):
+        return self.length
+
+
+class _Iterable(list):
+    """The recorded entries of an iterable, see _iterables.py."""
+
+    def preview(self):
+        return self.name, self, self.length, self.pairs
+
+
+STAND_INS[_Leaf] = (_TEXT, lambda leaf: leaf.text)
+STAND_INS[_BlockLeaf] = (_ARRAY, lambda leaf: leaf.text)
+STAND_INS[_Set] = (_SET, None)
+STAND_INS[_Iterable] = (_ITERABLE, _Iterable.preview)
+
+_CYCLE_MARKERS = {_LIST: "[...]", _DICT: "{...}"}
+
+# class name -> class of the rebuilt objects.
+_OBJECT_CLASSES: dict[str, type] = {}
+
+
+def _build(tag: int, name: Any, count: int | None, items: list) -> Any:
+    if tag == _LIST_TAG:
+        container = _List(items)
+    elif tag == _TUPLE_TAG:
+        container = _Tuple(items)
+    elif tag == _SET_TAG:
+        container = _Set(items)
+    elif tag == _DICT_TAG:
+        container = _Dict((_Key(key), value) for key, value in items)
+    elif tag == _ITERABLE_TAG:
+        # name is (type name, flags) for iterables.
+        pairs = bool(name[1] & _PAIRS)
+        if pairs:
+            items = [(_Key(key), value) for key, value in items]
+        container = _Iterable(items)
+        container.name = name[0]
+        container.pairs = pairs
+    else:
+        cls = _OBJECT_CLASSES.get(name)
+        if cls is None:
+            cls = _OBJECT_CLASSES[name] = type(name, (), {})
+        obj = cls()
+        fields = obj.__dict__
+        fields.update(items)
+        # Fields that were not recorded only need to be counted.
+        for _ in range(count - len(items)):
+            fields[object()] = None
+        return obj
+    container.length = count
+    return container
+
+
+def read_value(reader: _Reader) -> Any:
+    """Rebuild a value recorded by write_value()."""
+    # [tag, name, count, recorded, items, key, index] of the containers being rebuilt.
+    stack: list[list] = []
+    containers = reader.containers
+    while True:
+        key = None
+        if stack and (
+            stack[-1][0] in (_DICT_TAG, _OBJECT_TAG)
+            or (stack[-1][0] == _ITERABLE_TAG and stack[-1][1][1] & _PAIRS)
+        ):
+            key = reader.str()
+
+        tag = reader.byte()
+        if tag == _NONE:
+            value = None
+        elif tag == _TRUE:
+            value = True
+        elif tag == _FALSE:
+            value = False
+        elif tag == _INT:
+            number = reader.varint()
+            value = -((number + 1) >> 1) if number & 1 else number >> 1
+        elif tag == _FLOAT:
+            value = _DOUBLE.unpack(reader.raw(8))[0]
+        elif tag == _STR:
+            value = reader.str()
+        elif tag == _BYTES:
+            value = reader.raw(reader.varint())
+        elif tag == _TEXT_LEAF:
+            value = _Leaf(reader.str())
+        elif tag == _BLOCK:
+            value = _BlockLeaf(reader.str())
+        elif tag == _REF:
+            value = _Leaf(_CYCLE_MARKERS.get(reader.byte(), "CYCLIC REFERENCE"))
+        elif tag == _ALIAS_TAG:
+            value = containers[reader.varint()]
+        elif _LIST_TAG <= tag <= _OBJECT_TAG or tag == _ITERABLE_TAG:
+            if tag == _ITERABLE_TAG:
+                # (type name, flags)
+                name = (reader.str(), reader.varint())
+                count = reader.varint() if name[1] & _LENGTH_KNOWN else None
+            else:
+                name = reader.str() if tag == _OBJECT_TAG else None
+                count = reader.varint()
+            recorded = reader.varint()
+            if recorded:
+                stack.append([tag, name, count, recorded, [], key, len(containers)])
+                containers.append(None)
+                continue
+            value = _build(tag, name, count, [])
+            containers.append(value)
+        else:
+            raise ValueError("Unknown tag %d at offset %d" % (tag, reader.pos - 1))
+
+        # Add the value to its container, which may complete the container, and so on.
+        while stack:
+            frame = stack[-1]
+            frame[4].append(value if key is None else (key, value))
+            if len(frame[4]) < frame[3]:
+                break
+            stack.pop()
+            value = containers[frame[6]] = _build(
+                frame[0], frame[1], frame[2], frame[4]
+            )
+            key = frame[5]
+        else:
+            return value
+
+
+def iter_records(data: bytes) -> Iterator[tuple[str, Options, list[tuple[str, Any]]]]:
+    """Read the records of a file: location, options to render them with, and (expression, value) pairs."""
+    if not data.startswith(MAGIC):
+        raise ValueError("Not a crab_dbg record file")
+    reader = _Reader(data, len(MAGIC))
+    while reader.pos < len(data):
+        size = reader.varint()
+        end = reader.pos + size
+        if end > len(data):
+            raise ValueError("Truncated record at offset %d" % reader.pos)
+        reader.strings.clear()
+        reader.containers.clear()
+        location = reader.str()
+        options = Options()
+        options.max_items = reader.limit()
+        options.max_depth = reader.limit()
+        options.preview_items = reader.limit()
+        options.dedup = bool(reader.varint() & 1)
+        args = [(reader.str(), read_value(reader)) for _ in range(reader.varint())]
+        reader.pos = end
+        yield location, options, args
+
+
+def render_records(data: bytes, write) -> None:
+    """Render the records of a file in the same text format dbg() prints."""
+    for location, options, args in iter_records(data):
+        if not args:
+            write(location + "\n")
+        references = shared_references(tuple(value for _, value in args), options)
+        for raw_arg, value in args:
+            write("%s %s = " % (location, raw_arg))
+            render_human_readable_repr(value, write, options, references)
+            write("\n")
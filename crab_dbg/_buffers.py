@@ -0,0 +1,61 @@
+"""
+Hexdump previews of bytes, bytearray and memoryview, see the hexdump option.
+
+Only the previewed bytes are ever read, through memoryview slices, so a buffer of many megabytes is previewed as
+quickly as a small one. The checksum is the exception, it has to read the whole buffer, but does so without copying it,
+unless it is a memoryview whose bytes are not contiguous.
+"""
+
+from binascii import crc32
+from typing import Any
+
+BYTES_PER_LINE = 16
+
+# Bytes shown as themselves in the text column, all others are shown as ".".
+_PRINTABLE = bytes(b if 0x20 <= b < 0x7F else 0x2E for b in range(256))
+
+
+def format_hexdump(buffer: Any, size: int, checksum: bool) -> str:
+    """
+    Format the first `size` bytes of a buffer like `hexdump -C` does, below a header with its type and length, e.g.:
+
+        bytes(len=1,048,576, crc32=0x8a5c4f2e) [
+            00000000  89 50 4e 47 0d 0a 1a 0a  00 00 00 0d 49 48 44 52  |.PNG........IHDR|
+            ... 1,048,560 more bytes
+        ]
+
+    `checksum` adds the crc32 of the whole buffer to the header.
+    """
+    view = buffer if type(buffer) is memoryview else memoryview(buffer)
+    total = view.nbytes
+    header = "%s(len=%s" % (type(buffer).__name__, format(total, ","))
+    if checksum:
+        header += ", crc32=0x%08x" % crc32(
+            view if view.c_contiguous else view.tobytes()
+        )
+    if total == 0:
+        return header + ") []"
+
+    if not view.c_contiguous:
+        # Can't be viewed as flat bytes, e.g. every other item of an array. Copy only the rows shown.
+        row_size = total // len(view)
+        view = memoryview(view[: -(-size // row_size)].tobytes())
+    elif view.ndim != 1 or view.format != "B":
+        view = view.cast("B")
+    shown = view[:size]
+    # One copy of the shown bytes each, as hex and as text, sliced into lines.
+    hex_digits = shown.hex(" ")
+    text = shown.tobytes().translate(_PRINTABLE).decode("ascii")
+    lines = [header + ") ["]
+    for offset in range(0, len(shown), BYTES_PER_LINE):
+        line_hex = hex_digits[offset * 3 : (offset + BYTES_PER_LINE) * 3 - 1]
+        # An extra space between the two halves of a line.
+        line_hex = line_hex[:23] + " " + line_hex[23:]
+        lines.append(
+            "    %08x  %-48s  |%s|"
+            % (offset, line_hex.rstrip(), text[offset : offset + BYTES_PER_LINE])
+        )
+    if total > len(shown):
+        lines.append("    ... %s more bytes" % format(total - len(shown), ","))
+    lines.append("]")
+    return "\n".join(lines)
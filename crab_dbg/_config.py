@@ -0,0 +1,216 @@
+import os
+
+
+class Options:
+    """
+    Settings of crab_dbg. The global instance, `config`, is changed with configure(), and most of its settings can
+    also be overridden for a single dbg() call with keyword arguments of the same name.
+
+    enabled: If False, dbg() returns its arguments right away, without printing anything.
+    max_items: Render at most this many items of a container, or fields of an object. None means no limit.
+    max_depth: Render at most this many levels of nested containers and objects, deeper ones are collapsed into a
+        one line summary. None means no limit.
+    max_string: Render at most this many characters of a single value's own representation. None means no limit.
+    preview_items: Render deques, dict views, arrays and memoryviews item by item, at most this many items, and preview
+        iterators passed to dbg(), like generators or map objects, by their first this many items. dbg() then returns
+        an iterator yielding the previewed items followed by the rest, in place of the one it was given. None, the
+        default, means all of them are rendered by their repr(), and iterators are left alone.
+    hexdump: Render bytes, bytearray and memoryview as a hexdump of their first this many bytes, below their length.
+        Only those bytes are read, so previewing a huge buffer is as quick as a small one. None, the default, means
+        they are rendered by their repr().
+    checksum: Add the crc32 of the whole buffer to hexdumps.
+    dedup: Render containers and objects reachable more than once from the arguments of a dbg() call only once. The
+        first one gets an anchor like "&1", later ones, in the same or a later argument, are rendered as a reference to
+        it, like "*1".
+    memoize: Cache the renderings of large immutable values, i.e. tuples and frozensets of immutable values, enum
+        members and frozen dataclasses, so dumping the same lookup table again and again is nearly free.
+    memo_size: How many renderings the memoize cache holds, the least recently used ones are dropped first.
+        Global only.
+    array_summary: Render numpy arrays, pytorch tensors, pandas, polars and xarray data as a one line summary of
+        their shape, dtype, memory footprint and basic statistics, instead of their full repr().
+    tensor_data: Whether the data of pytorch tensors may be read. If False, tensors are rendered by their metadata
+        only. None, the default, means only tensors on the CPU are read, as reading a CUDA or MPS tensor forces a
+        device synchronization and a copy to the host.
+    output_format: "text", the default, prints `[file:line:col] expr = value` lines for humans. "json" prints one JSON
+        object per argument and line instead, with file, line, col, expr, type, value, ts (wall clock time) and
+        thread keys, for log collectors. "binary" appends compact binary records of the values to the file at
+        `record_path` instead, which are rendered to text later with `python -m crab_dbg render <record_path>`.
+    record_path: The file binary records are appended to.
+    sample_every: Print only every Nth call of each dbg() call site, i.e. the 1st, (N+1)th, (2N+1)th... None means all.
+    sample_rate: Print each call with this probability. None means all.
+    rate_limit: Print at most this many calls per second of each dbg() call site. None means no limit.
+    changed_only: Only print the arguments of a dbg() call whose rendering changed since the last call of the same
+        call site, see also dbg.watch().
+    diff: With changed_only, print a diff of the renderings instead of the whole new one. Text output only.
+    profile: Measure how long dbg() takes at each call site, split in stages: finding the call site, parsing its source
+        code, rendering and writing. See stats(), the timings are also printed at exit. Global only.
+    show_thread: Tag the output with the name of the calling thread.
+    show_task: Tag the output with the name of the calling asyncio task, if called from one.
+    show_time: Tag the output with a monotonic timestamp, in seconds.
+    background: Write output on a background thread, so dbg() never waits for slow I/O. Global only.
+    queue_size: How many records the background writer can hold before `overflow` kicks in. Global only.
+    overflow: What to do when the background writer's queue is full, "block" until there is room, or "drop" the
+        record. Global only.
+    """
+
+    __slots__ = (
+        "enabled",
+        "max_items",
+        "max_depth",
+        "max_string",
+        "preview_items",
+        "hexdump",
+        "checksum",
+        "dedup",
+        "memoize",
+        "memo_size",
+        "array_summary",
+        "tensor_data",
+        "output_format",
+        "record_path",
+        "sample_every",
+        "sample_rate",
+        "rate_limit",
+        "changed_only",
+        "diff",
+        "profile",
+        "show_thread",
+        "show_task",
+        "show_time",
+        "background",
+        "queue_size",
+        "overflow",
+    )
+
+    def __init__(self):
+        self.enabled: bool = True
+        self.max_items: int | None = None
+        self.max_depth: int | None = None
+        self.max_string: int | None = None
+        self.preview_items: int | None = None
+        self.hexdump: int | None = None
+        self.checksum: bool = False
+        self.dedup: bool = False
+        self.memoize: bool = False
+        self.memo_size: int = 1024
+        self.array_summary: bool = False
+        self.tensor_data: bool | None = None
+        self.output_format: str = "text"
+        self.record_path: str = "crab_dbg.records"
+        self.sample_every: int | None = None
+        self.sample_rate: float | None = None
+        self.rate_limit: float | None = None
+        self.changed_only: bool = False
+        self.diff: bool = False
+        self.profile: bool = False
+        self.show_thread: bool = False
+        self.show_task: bool = False
+        self.show_time: bool = False
+        self.background: bool = False
+        self.queue_size: int = 10000
+        self.overflow: str = "block"
+
+    def copy(self) -> "Options":
+        options = Options.__new__(Options)
+        for name in Options.__slots__:
+            setattr(options, name, getattr(self, name))
+        return options
+
+    def override(self, **overrides) -> "Options":
+        """
+        Get options for one call: if all overrides are None, that's self, otherwise a copy with them applied. Raises
+        ValueError for invalid values, like configure().
+        """
+        options = self
+        for name, value in overrides.items():
+            if value is None:
+                continue
+            _validate(name, value)
+            if options is self:
+                options = self.copy()
+            setattr(options, name, value)
+        return options
+
+
+config = Options()
+
+# dbg() calls can be left in production code, and turned off by setting this environment variable.
+config.enabled = os.environ.get("CRAB_DBG_DISABLE", "") in ("", "0")
+
+
+def configure(**options) -> None:
+    """
+    Change the global settings of crab_dbg, see Options for all of them. For example:
+
+        configure(max_items=100, max_depth=5)
+    """
+    for name, value in options.items():
+        if name not in Options.__slots__:
+            raise TypeError(
+                "configure() got an unexpected keyword argument '%s'" % name
+            )
+        _validate(name, value)
+    for name, value in options.items():
+        setattr(config, name, value)
+
+
+def enable() -> None:
+    """Turn dbg() on, which is the default unless the CRAB_DBG_DISABLE environment variable is set."""
+    config.enabled = True
+
+
+def disable() -> None:
+    """Turn dbg() off, it then returns its arguments right away, at nearly the cost of an empty function call."""
+    config.enabled = False
+
+
+def is_enabled() -> bool:
+    return config.enabled
+
+
+def _validate(name: str, value) -> None:
+    bool_options = (
+        "enabled",
+        "checksum",
+        "dedup",
+        "memoize",
+        "array_summary",
+        "changed_only",
+        "diff",
+        "profile",
+        "show_thread",
+        "show_task",
+        "show_time",
+        "background",
+    )
+    if name in bool_options and not isinstance(value, bool):
+        raise ValueError("%s must be a bool, got %r" % (name, value))
+    if name in ("queue_size", "memo_size") and (
+        not isinstance(value, int) or value < 1
+    ):
+        raise ValueError("%s must be a positive int, got %r" % (name, value))
+    if name == "overflow" and value not in ("block", "drop"):
+        raise ValueError('overflow must be "block" or "drop", got %r' % (value,))
+    if name == "output_format" and value not in ("text", "json", "binary"):
+        raise ValueError(
+            'output_format must be "text", "json" or "binary", got %r' % (value,)
+        )
+    if name == "record_path" and not isinstance(value, str):
+        raise ValueError("record_path must be a str, got %r" % (value,))
+    if name == "tensor_data" and value is not None and not isinstance(value, bool):
+        raise ValueError("tensor_data must be None or a bool, got %r" % (value,))
+    if name == "sample_every":
+        if value is not None and (not isinstance(value, int) or value < 1):
+            raise ValueError(
+                "sample_every must be None or a positive int, got %r" % (value,)
+            )
+    if name in ("sample_rate", "rate_limit"):
+        if value is not None and (not isinstance(value, (int, float)) or value < 0):
+            raise ValueError(
+                "%s must be None or a non-negative number, got %r" % (name, value)
+            )
+    if name in ("max_items", "max_depth", "max_string", "preview_items", "hexdump"):
+        if value is not None and (not isinstance(value, int) or value < 0):
+            raise ValueError(
+                "%s must be None or a non-negative int, got %r" % (name, value)
+            )
@@ -1,281 +1,204 @@
-from ast import parse, unparse
-import dis
+from collections import OrderedDict
 import inspect
 from os import path
-import re
+import sys
 from sys import stderr
-from types import FrameType
-from typing import Any
-
-
-_CONTROL_CHAR_RE = re.compile("[\x00-\x1f\x7f-\x9f]")
-
-
-def _is_numpy_tensor_pandas_data(val: Any) -> bool:
-    """Check if the value is numpy ndarray, pytorch tensor, or pandas data frame"""
-
-    # Cannot use isinstance() here as import those large library is too time-consuming.
-    cls = val.__class__
-    module = cls.__module__
-    name = cls.__name__
-
-    # Check for numpy.ndarray
-    if module == "numpy" and name == "ndarray":
-        return True
-
-    # Check for PyTorch Tensor
-    if module == "torch" and name == "Tensor":
-        return True
-
-    # Check for pandas DataFrame (module starts with 'pandas' and class name is 'DataFrame')
-    if module.startswith("pandas.") and name == "DataFrame":
-        return True
-
-    return False
-
-
-def _has_custom_repr(val: Any) -> bool:
-    """Check if the value has a custom __repr__."""
-    return val.__class__.__repr__ is not object.__repr__
-
-
-def _has_custom_str(val: Any) -> bool:
-    """Check if the value has a custom __str__."""
-    return val.__class__.__str__ is not object.__str__
-
-
-def _is_built_in_types(val: Any) -> bool:
+from time import perf_counter_ns
+from types import CodeType, FrameType
+from typing import TextIO
+
+from ._binary import append_record, format_binary_record
+from ._config import Options, config
+from ._format import (
+    get_human_readable_repr,
+    render_human_readable_repr,
+    shared_references,
+)
+from ._iterables import preview_iterators
+from ._json import format_json_records
+from ._output import (
+    DEFAULT_CHUNK_SIZE,
+    WRITE_LOCK,
+    ChunkedWriter,
+    flush_background_writer,
+    get_context_tags,
+    write_output,
+)
+from ._sampling import Sampler
+from ._span import span, trace
+from ._source import (
+    get_dbg_raw_args,
+    get_frame_positions,
+    get_source_lines,
+    get_source_stat,
+)
+from ._stats import RENDER, WRITE, SiteProfile, get_profile
+from ._watch import Watcher
+
+
+class _CallSite:
     """
-    Determine if a values is an instance of python built-in types.
+    Everything dbg() needs to know about one call site. Resolved once, then reused by every following call.
     """
-    return type(val).__module__ == "builtins"
-
 
-def _get_dbg_raw_args(source_code: str, positions: dis.Positions) -> list[str]:
-    """
-    Get the arguments to dbg() function as a list of strings. Does not include keyword arguments.
-    """
-    source_code_lines: list[str] = source_code.split("\n")
+    __slots__ = (
+        "code",
+        "filename",
+        "lineno",
+        "col",
+        "relpath",
+        "location",
+        "raw_args",
+        "source_stat",
+        "sampler",
+        "watcher",
+        "parse_ns",
+        "profile",
+    )
 
-    # Get the dbg function call. This might across multiple lines.
-    dbg_call_lines: list[str] = list(
-        map(
-            lambda x: x.strip(),
-            source_code_lines[positions.lineno - 1 : positions.end_lineno],
+    def __init__(
+        self,
+        code: CodeType,
+        filename: str,
+        lineno: int,
+        col: int,
+        raw_args: list[str],
+        source_stat: tuple[int, int] | None,
+        parse_ns: int,
+    ):
+        # Kept alive, so its id is not reused by another code object while the call site is cached.
+        self.code = code
+        self.filename = filename
+        self.lineno = lineno
+        self.col = col
+        self.relpath = path.relpath(filename)
+        # [<file_rel_path>:<line_no>:<col_no>]
+        self.location = "[%s:%s:%s]" % (self.relpath, lineno, col)
+        self.raw_args = raw_args
+        self.source_stat = source_stat
+        # Only created when sampling is enabled for this call site.
+        self.sampler: Sampler | None = None
+        # Only created when changed_only is enabled for this call site.
+        self.watcher: Watcher | None = None
+        # Time spent parsing raw_args, if profiling, until counted by the first call.
+        self.parse_ns = parse_ns
+        # Only looked up when profiling.
+        self.profile: SiteProfile | None = None
+
+    def should_emit(self, options: Options) -> bool:
+        """Apply sampling and rate limiting to this call."""
+        sampler = self.sampler
+        if sampler is None:
+            sampler = self.sampler = Sampler(self.location)
+        return sampler.should_emit(
+            options.sample_every, options.sample_rate, options.rate_limit
         )
-    )
 
-    dbg_call: str = "\n".join(dbg_call_lines)
-    dbg_call_args = parse(dbg_call).body[0].value.args
-    return [unparse(arg) for arg in dbg_call_args]
+
+# A call site is uniquely identified by its code object and the offset of the CALL instruction in that code. The code
+# object is keyed by its id, hashing it would cost as much as its bytecode is long.
+_CALL_SITES: OrderedDict[tuple[int, int], _CallSite] = OrderedDict()
+# Dynamically generated code (exec() in a loop, for example) could produce endless call sites, so cap the cache. The
+# least recently used call site goes first, together with its sampling and watch state.
+_CALL_SITES_MAX_SIZE = 4096
 
 
-def _get_human_readable_repr(obj: Any) -> str:
+def _get_call_site(frame: FrameType) -> _CallSite | None:
     """
-    Get a useful dbg representation of an object.
-
-    By default, python just prints things like '<__main__.Linkedlist object at 0x102c47560>', which is useless.
-    This function returns things like:
-    Linkedlist {
-        start: Node {
-            val: 0,
-            next: Node {
-                val: 1,
-                next: Node {
-                    val: 2,
-                    next: None,
-                }
-            }
-        }
-    }
+    Get the call site of the dbg() call made in this frame, or None if its source code is not available.
+    The expensive part, i.e. reading and parsing source code, only happens the first time a call site is seen, or when
+    its source file has been modified since then.
     """
+    code = frame.f_code
+    key = (id(code), frame.f_lasti)
+    cached_call_site = _CALL_SITES.get(key)
+    if cached_call_site is not None and (
+        cached_call_site.source_stat is None
+        or cached_call_site.source_stat == get_source_stat(cached_call_site.filename)
+    ):
+        try:
+            _CALL_SITES.move_to_end(key)
+        except KeyError:
+            # Evicted by another thread meanwhile.
+            pass
+        return cached_call_site
 
-    def _delete_special_characters(string: str) -> str:
-        """
-        Delete control characters like '\b'
-        """
-        return _CONTROL_CHAR_RE.sub("", string)
-
-    def _indent_multiline_str(string: str, indent: int) -> str:
-        """
-        Apply additional indent to a possibly already formatted, multiline representation.
-        """
-        lines = string.splitlines(keepends=True)
-        if not lines:
-            return ""
-
-        # No need to indent the first line.
-        first_line = _delete_special_characters(lines[0].rstrip("\n\r"))
-        if len(lines) == 1:
-            return first_line
-
-        # Add indent.
-        indented_lines = [first_line]
-        for line in lines[1:]:
-            stripped_line = _delete_special_characters(line.rstrip("\n\r"))
-            indented_line = " " * indent + stripped_line
-            indented_lines.append(indented_line)
-
-        return "\n".join(indented_lines)
-
-    INDENT_INCREMENT = 4
-
-    def _get_human_readable_repr_recursion(
-        obj: Any, indent: int, recursion_path: set, ml_container_new_line: bool
-    ) -> str:
-        """recursion_path: Backtracking algorithm to detect cyclic reference"""
-        if id(obj) in recursion_path:
-            if isinstance(obj, list):
-                return "[...]"
-            elif isinstance(obj, dict):
-                return "{...}"
-            return "CYCLIC REFERENCE"
-        recursion_path.add(id(obj))
+    filename = code.co_filename
+    positions = get_frame_positions(frame)
 
-        try:
-            fields_dbg_repr = []
-
-            # Handle data containers.
-            if isinstance(obj, (list, set, tuple)):
-                for item in obj:
-                    # <num_of_ident><val>
-                    fields_dbg_repr.append(
-                        "%s%s"
-                        % (
-                            " " * (indent + INDENT_INCREMENT),
-                            _get_human_readable_repr_recursion(
-                                item,
-                                indent + INDENT_INCREMENT,
-                                recursion_path,
-                                ml_container_new_line=False,
-                            ),
-                        )
-                    )
-
-                if isinstance(obj, list):
-                    return (
-                        "[\n" + ",\n".join(fields_dbg_repr) + "\n" + " " * indent + "]"
-                    )
-                elif isinstance(obj, tuple):
-                    return (
-                        "(\n" + ",\n".join(fields_dbg_repr) + "\n" + " " * indent + ")"
-                    )
-                else:
-                    return (
-                        "{\n" + ",\n".join(fields_dbg_repr) + "\n" + " " * indent + "}"
-                    )
-            elif isinstance(obj, dict):
-                for key, value in obj.items():
-                    fields_dbg_repr.append(
-                        # <num_of_ident><key>: <val>
-                        "%s%s: %s"
-                        % (
-                            " " * (indent + INDENT_INCREMENT),
-                            key,
-                            _get_human_readable_repr_recursion(
-                                value,
-                                indent + INDENT_INCREMENT,
-                                recursion_path,
-                                ml_container_new_line=True,
-                            ),
-                        )
-                    )
-                return "{\n" + ",\n".join(fields_dbg_repr) + "\n" + " " * indent + "}"
-            elif _is_numpy_tensor_pandas_data(obj):
-                if indent == 0:
-                    return "\n" + _indent_multiline_str(repr(obj), indent)
-                elif ml_container_new_line:
-                    return (
-                        "\n"
-                        + " " * (indent + INDENT_INCREMENT)
-                        + _indent_multiline_str(repr(obj), indent + INDENT_INCREMENT)
-                    )
-                else:
-                    return _indent_multiline_str(repr(obj), indent)
-            elif _has_custom_repr(obj):
-                return _indent_multiline_str(repr(obj), indent)
-            elif _has_custom_str(obj) or _is_built_in_types(obj):
-                return _indent_multiline_str(str(obj), indent)
-            else:
-                # Just an object without __repr__ or __str__ provided.
-                # Handle instance variables.
-                for key, value in obj.__dict__.items():
-                    fields_dbg_repr.append(
-                        "%s%s: %s"
-                        % (
-                            " " * (indent + INDENT_INCREMENT),
-                            key,
-                            _get_human_readable_repr_recursion(
-                                value,
-                                indent + INDENT_INCREMENT,
-                                recursion_path,
-                                ml_container_new_line=True,
-                            ),
-                        )
-                    )
-
-                # Handle class variables.
-                for key, value in obj.__class__.__dict__.items():
-                    if key.startswith("__") and key.endswith("__"):
-                        # Magic method, ignore
-                        continue
-                    if callable(value):
-                        # Function, ignore
-                        continue
-                    if key in obj.__dict__:
-                        # A class variable has the same name as instance variable, ignore.
-                        continue
-                    fields_dbg_repr.append(
-                        "%s%s: %s"
-                        % (
-                            " " * (indent + INDENT_INCREMENT),
-                            obj.__class__.__name__ + "." + key,
-                            _get_human_readable_repr_recursion(
-                                value,
-                                indent + INDENT_INCREMENT,
-                                recursion_path,
-                                ml_container_new_line=True,
-                            ),
-                        )
-                    )
-
-                if len(fields_dbg_repr) == 0:
-                    return obj.__class__.__name__ + " {\n" + " " * indent + "}"
-                else:
-                    return (
-                        obj.__class__.__name__
-                        + " {\n"
-                        + "\n".join(fields_dbg_repr)
-                        + "\n"
-                        + " " * indent
-                        + "}"
-                    )
-        finally:
-            # This will execute BEFORE any return statement in try block.
-            recursion_path.remove(id(obj))
-
-    return _get_human_readable_repr_recursion(obj, 0, set(), ml_container_new_line=True)
-
-
-def _get_source_code(frame: FrameType, filename: str) -> str | None:
-    """
-    Get the source code of this frame as a single string.
-    We try to read the named file first, if failed, then try inspect.getsource() to handle the cases where source code
-    file is not available.
-    """
-    try:
-        with open(filename, "r") as f:
-            return f.read()
-    except OSError:
-        pass
-
-    try:
-        return inspect.getsource(frame)
-    except OSError:
+    # Stat before reading, so a modification in between is detected by the next call.
+    source_stat = get_source_stat(filename, fresh=True)
+
+    # Cannot use inspect.getsource, limited by dynamic environment, such like pytest.
+    source_lines = get_source_lines(frame, filename)
+    if source_lines is None:
         return None
 
+    parse_started = perf_counter_ns() if config.profile else 0
+    if cached_call_site is None:
+        raw_args = get_dbg_raw_args(source_lines, positions)
+    else:
+        # The file was edited, but this code object still runs the old code, whose positions may not fit the new file.
+        try:
+            raw_args = get_dbg_raw_args(source_lines, positions)
+        except (SyntaxError, AttributeError, IndexError):
+            raw_args = None
+        if raw_args is None or len(raw_args) != len(cached_call_site.raw_args):
+            # Keep what the old code was parsed to, until the module is reloaded.
+            cached_call_site.source_stat = source_stat
+            return cached_call_site
+    parse_ns = perf_counter_ns() - parse_started if parse_started else 0
+
+    call_site = _CallSite(
+        code,
+        filename,
+        positions.lineno,
+        (positions.col_offset or 0) + 1,  # Because this is col idx.
+        raw_args,
+        source_stat,
+        parse_ns,
+    )
+    if cached_call_site is not None:
+        # Source code is modified, but it is still the same call site.
+        call_site.sampler = cached_call_site.sampler
+        call_site.watcher = cached_call_site.watcher
+        call_site.profile = cached_call_site.profile
 
-def dbg(*evaluated_args, sep=" ", end="\n", file=None, flush=False):
+    if cached_call_site is None and len(_CALL_SITES) >= _CALL_SITES_MAX_SIZE:
+        try:
+            _CALL_SITES.popitem(last=False)
+        except KeyError:
+            pass
+    _CALL_SITES[key] = call_site
+    return call_site
+
+
+def dbg(
+    *evaluated_args,
+    sep=" ",
+    end="\n",
+    file=None,
+    flush=False,
+    stream=False,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    max_items=None,
+    max_depth=None,
+    max_string=None,
+    preview_items=None,
+    hexdump=None,
+    checksum=None,
+    dedup=None,
+    memoize=None,
+    array_summary=None,
+    tensor_data=None,
+    output_format=None,
+    record_path=None,
+    sample_every=None,
+    sample_rate=None,
+    rate_limit=None,
+    changed_only=None,
+    diff=None,
+):
     """
     Print the value of the argument and return it, similar to Rust's dbg! macro.
 
@@ -290,64 +213,310 @@ def dbg(*evaluated_args, sep=" ", end="\n", file=None, flush=False):
 
     Args:
         *evaluated_args: The arguments to be printed and returned.
-        sep: Separator string for multiple arguments.
+        sep: Separator string for multiple arguments. Accepted for compatibility with print(), each argument is
+            printed on its own.
         end: End string for the output.
         file: File to write to (default is sys.stderr).
         flush: Whether to flush the output.
+        stream: Write the representation of each argument to file piece by piece while it is being formatted, instead
+            of building it as a whole first. Useful for really large values.
+        chunk_size: When streaming, roughly how many characters are written to file at once.
+        max_items: Render at most this many items of each container. Defaults to the global setting, see configure().
+        max_depth: Render at most this many levels of nested values. Defaults to the global setting.
+        max_string: Render at most this many characters of each single value. Defaults to the global setting.
+        preview_items: Render at most this many items of iterables like deques, and preview iterator arguments, like
+            generators, by their first this many items. An iterator is then returned in place of the one given, which
+            yields all of its items. Defaults to the global setting.
+        hexdump: Render bytes, bytearray and memoryview as a hexdump of their first this many bytes. Defaults to the
+            global setting, which renders them by their repr().
+        checksum: Add the crc32 of the whole buffer to hexdumps. Defaults to the global setting.
+        dedup: Render values reachable more than once from the arguments only once, later occurrences, also in later
+            arguments, refer to the first one. Defaults to the global setting.
+        memoize: Reuse the renderings of large immutable values seen before. Defaults to the global setting.
+        array_summary: Render arrays, tensors and data frames as a one line summary instead of their full repr().
+            Defaults to the global setting.
+        tensor_data: Whether the data of pytorch tensors may be read, if False they are rendered by their metadata
+            only. Defaults to the global setting, which reads tensors on the CPU only.
+        output_format: "text", "json" or "binary", see configure(). Defaults to the global setting, "text". In
+            "json" and "binary" mode, `sep`, `end` and `stream` are ignored, and so is `file` in "binary" mode.
+        record_path: The file binary records are appended to. Defaults to the global setting.
+        sample_every: Only print every Nth call of this call site. Defaults to the global setting.
+        sample_rate: Only print a call of this call site with this probability. Defaults to the global setting.
+        rate_limit: Print at most this many calls of this call site per second. Defaults to the global setting.
+        changed_only: Only print the arguments whose rendering changed since the last call of this call site.
+            Defaults to the global setting. `stream` is ignored then, as the whole rendering is needed to compare.
+        diff: With changed_only, print what changed as a diff against the previous rendering. Text output only.
+            Defaults to the global setting.
 
     Returns:
         The first argument passed to the function, or None if no arguments.
     """
+    if not config.enabled:
+        if len(evaluated_args) == 1:
+            return evaluated_args[0]
+        return evaluated_args or None
+
+    options = config.override(
+        max_items=max_items,
+        max_depth=max_depth,
+        max_string=max_string,
+        preview_items=preview_items,
+        hexdump=hexdump,
+        checksum=checksum,
+        dedup=dedup,
+        memoize=memoize,
+        array_summary=array_summary,
+        tensor_data=tensor_data,
+        output_format=output_format,
+        record_path=record_path,
+        sample_every=sample_every,
+        sample_rate=sample_rate,
+        rate_limit=rate_limit,
+        changed_only=changed_only,
+        diff=diff,
+    )
+    return _dbg(
+        sys._getframe(1),
+        evaluated_args,
+        options,
+        sep,
+        end,
+        file,
+        flush,
+        stream,
+        chunk_size,
+    )
 
-    frame = inspect.currentframe().f_back
-    info = inspect.getframeinfo(frame)
 
-    # Cannot use inspect.getsource, limited by dynamic environment, such like pytest.
-    source_code = _get_source_code(frame, info.filename)
-    if source_code is None:
+def _dbg(
+    frame: FrameType,
+    evaluated_args: tuple,
+    options: Options,
+    sep: str,
+    end: str | None,
+    file: TextIO | None,
+    flush: bool,
+    stream: bool,
+    chunk_size: int,
+):
+    """dbg() called in `frame`, with its options resolved."""
+    # How long each stage of this call takes, if profiling, see the profile option.
+    profile = None
+    # Read once, another thread may turn profiling on or off meanwhile.
+    profiling = config.profile
+    if profiling:
+        started = perf_counter_ns()
+
+    call_site = _get_call_site(frame)
+    del frame
+
+    if call_site is None:
         print("crab_dbg: Sorry, cannot get original code", file=stderr)
         return evaluated_args[0] if len(evaluated_args) == 1 else evaluated_args
 
-    raw_args = _get_dbg_raw_args(source_code, info.positions)
+    if profiling:
+        profile = call_site.profile
+        if profile is None:
+            profile = call_site.profile = get_profile(call_site.location)
+        started = profile.start_call(started, call_site.parse_ns)
+        call_site.parse_ns = 0
+
+    raw_args = call_site.raw_args
 
     assert len(raw_args) == len(evaluated_args), (
         "Number of raw_args does not equal to number of received args"
     )
 
+    if (
+        options.sample_every is not None
+        or options.sample_rate is not None
+        or options.rate_limit is not None
+    ) and not call_site.should_emit(options):
+        if len(evaluated_args) == 1:
+            return evaluated_args[0]
+        return evaluated_args or None
+
+    # Iterators can only be consumed once, dbg() renders their first items, and returns them followed by the rest.
+    rendered_args = evaluated_args
+    if options.preview_items is not None:
+        rendered_args, evaluated_args = preview_iterators(
+            evaluated_args, options.preview_items
+        )
+
+    # What to print for each argument, if changed_only. None for those unchanged since the last call.
+    changes = None
+    if options.changed_only and raw_args:
+        watcher = call_site.watcher
+        if watcher is None:
+            watcher = call_site.watcher = Watcher()
+        changes = watcher.changes(
+            [get_human_readable_repr(arg, options) for arg in rendered_args],
+            options.diff and options.output_format == "text",
+        )
+        if all(change is None for change in changes):
+            if profile is not None:
+                profile.lap(RENDER, started)
+            if len(evaluated_args) == 1:
+                return evaluated_args[0]
+            return evaluated_args
+        if options.output_format != "text":
+            # Other formats render the changed arguments again, as they are.
+            changed = [i for i, change in enumerate(changes) if change is not None]
+            raw_args = [raw_args[i] for i in changed]
+            rendered_args = tuple(rendered_args[i] for i in changed)
+
+    if options.output_format == "json":
+        records = format_json_records(
+            call_site.relpath,
+            call_site.lineno,
+            call_site.col,
+            raw_args,
+            rendered_args,
+            options,
+        )
+        if profile is not None:
+            started = profile.lap(RENDER, started)
+        write_output(file, records, flush, options)
+        if profile is not None:
+            profile.lap(WRITE, started)
+        if len(evaluated_args) == 1:
+            return evaluated_args[0]
+        return evaluated_args or None
+
+    if end is None:
+        end = "\n"
+
+    # [<file_rel_path>:<line_no>:<col_no>]
+    location = call_site.location + get_context_tags(options)
+
+    if options.output_format == "binary":
+        # Values are recorded as they are, rendering them is left to `python -m crab_dbg render`.
+        record = format_binary_record(location, raw_args, rendered_args, options)
+        if profile is not None:
+            started = profile.lap(RENDER, started)
+        append_record(options.record_path, record, flush)
+        if profile is not None:
+            profile.lap(WRITE, started)
+        if len(evaluated_args) == 1:
+            return evaluated_args[0]
+        return evaluated_args or None
+
     # If no arguments at all.
     if len(raw_args) == 0:
-        print(
-            # [<file_rel_path>:<line_no>:<col_no>]
-            "[%s:%s:%s]"
-            % (
-                path.relpath(info.filename),
-                info.lineno,
-                info.positions.col_offset + 1,  # Because this is col idx.
-            ),
-            sep=sep,
-            end=end,
-            file=file,
-            flush=flush,
-        )
+        write_output(file, location + end, flush, options)
+        if profile is not None:
+            profile.lap(WRITE, started)
         return None
 
-    for raw_arg, evaluated_arg in zip(raw_args, evaluated_args):
-        human_readable_repr = _get_human_readable_repr(evaluated_arg)
-        print(
+    if stream and changes is None:
+        # Same as print(), file=None means sys.stdout. Look it up now, as it might have been replaced.
+        if file is None:
+            file = sys.stdout
+        # Streamed output bypasses the background writer, wait for it so output stays in order.
+        flush_background_writer()
+        references = shared_references(rendered_args, options)
+        for raw_arg, rendered_arg in zip(raw_args, rendered_args):
+            writer = ChunkedWriter(file.write, chunk_size)
+            # Hold the lock while streaming, otherwise other threads' output would end up in the middle of ours.
+            with WRITE_LOCK:
+                # [<file_rel_path>:<line_no>:<col_no>] <raw_arg> = <dbg_repr>
+                writer.write("%s %s = " % (location, raw_arg))
+                render_human_readable_repr(
+                    rendered_arg, writer.write, options, references
+                )
+                writer.write(end)
+                writer.flush()
+                if flush:
+                    file.flush()
+        if profile is not None:
+            # Rendering and writing can't be told apart when streaming.
+            profile.lap(RENDER, started)
+        return evaluated_args[0] if len(evaluated_args) == 1 else evaluated_args
+
+    # Output of all arguments is written at once, so it is not interleaved with other threads' output.
+    fragments: list[str] = []
+    append = fragments.append
+    if changes is not None:
+        for raw_arg, change in zip(raw_args, changes):
+            if change is None:
+                continue
+            text, is_diff = change
+            # [<file_rel_path>:<line_no>:<col_no>] <raw_arg> changed:
+            # <diff>
+            append(location)
+            append(" ")
+            append(raw_arg)
+            append(" changed:\n" if is_diff else " = ")
+            append(text)
+            append(end)
+    else:
+        references = shared_references(rendered_args, options)
+        for raw_arg, rendered_arg in zip(raw_args, rendered_args):
             # [<file_rel_path>:<line_no>:<col_no>] <raw_arg> = <dbg_repr>
-            "[%s:%s:%s] %s = %s"
-            % (
-                path.relpath(info.filename),
-                info.lineno,
-                info.positions.col_offset + 1,  # Because this is col idx.
-                raw_arg,
-                human_readable_repr,
-            ),
-            sep=sep,
-            end=end,
-            file=file,
-            flush=flush,
-        )
+            append(location)
+            append(" ")
+            append(raw_arg)
+            append(" = ")
+            render_human_readable_repr(rendered_arg, append, options, references)
+            append(end)
+    output = "".join(fragments)
+    if profile is not None:
+        started = profile.lap(RENDER, started)
+    write_output(file, output, flush, options)
+    if profile is not None:
+        profile.lap(WRITE, started)
 
     # Return the first argument to enable chaining like Rust's dbg!
     return evaluated_args[0] if len(evaluated_args) == 1 else evaluated_args
+
+
+def watch(
+    *evaluated_args,
+    sep=" ",
+    end="\n",
+    file=None,
+    flush=False,
+    stream=False,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    **options,
+):
+    """
+    Same as dbg(..., changed_only=True): print the arguments only when their rendering changed since the last call of
+    this call site, which keeps a dbg() in a polling loop quiet while nothing happens. Takes the same arguments as
+    dbg(), e.g. `dbg.watch(state, diff=True)` prints what changed as a diff.
+    """
+    if not config.enabled:
+        if len(evaluated_args) == 1:
+            return evaluated_args[0]
+        return evaluated_args or None
+
+    for name in options:
+        if name not in _DBG_OPTIONS:
+            raise TypeError("watch() got an unexpected keyword argument '%s'" % name)
+    return _dbg(
+        sys._getframe(1),
+        evaluated_args,
+        config.override(changed_only=True, **options),
+        sep,
+        end,
+        file,
+        flush,
+        stream,
+        chunk_size,
+    )
+
+
+# Options dbg() and watch() take for a single call.
+_DBG_OPTIONS = frozenset(inspect.signature(dbg).parameters) - {
+    "evaluated_args",
+    "sep",
+    "end",
+    "file",
+    "flush",
+    "stream",
+    "chunk_size",
+}
+
+dbg.span = span
+dbg.trace = trace
+dbg.watch = watch
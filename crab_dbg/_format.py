@@ -0,0 +1,850 @@
+import re
+import sys
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator
+
+from ._arrays import SUMMARIZERS, array_library, summarize_tensor, tensor_reads_data
+from ._buffers import format_hexdump
+from ._config import Options, config
+from ._iterables import iter_preview, iterable_preview, preview_limit
+from ._memo import RENDER_CACHE, is_memo_candidate
+
+
+_CONTROL_CHAR_RE = re.compile("[\x00-\x1f\x7f-\x9f]")
+
+INDENT_INCREMENT = 4
+
+# _INDENTS[level] is the indent string of nesting level `level`, for the levels most values stay within. Deeper ones
+# are built when needed, caching them would hold on to quadratically many characters.
+_CACHED_INDENT_LEVELS = 64
+_INDENTS: tuple[str, ...] = tuple(
+    " " * (INDENT_INCREMENT * level) for level in range(_CACHED_INDENT_LEVELS)
+)
+
+
+def _get_indent(level: int) -> str:
+    """Get the indent string of a nesting level, without allocating a new string every time."""
+    if level < _CACHED_INDENT_LEVELS:
+        return _INDENTS[level]
+    return " " * (INDENT_INCREMENT * level)
+
+
+# How a value is rendered, decided by its type. Keep the order of the first three, they're handled together.
+_LIST = 0
+_TUPLE = 1
+_SET = 2
+_DICT = 3
+_OBJECT = 4  # Just an object without __repr__ or __str__, its fields are rendered.
+_ARRAY = (
+    5  # A multiline block of text, like the repr() of numpy, pytorch or pandas data.
+)
+_TEXT = 6  # Rendered as text, by repr(), str() or a registered formatter.
+_SIMPLE = 7  # Rendered by its repr(), which is known to be a single line without control characters.
+_TENSOR = 8  # A pytorch tensor, rendered like _ARRAY, or by its metadata only, see the tensor_data option.
+_ITERABLE = 9  # With preview_items, rendered like a list or a dict, but only its first entries, see _iterables.py.
+_BUFFER = 10  # bytes, bytearray or memoryview, rendered as a hexdump preview, see the hexdump option.
+_WRITTEN = -1  # Not a kind of type: the value has been written already, as a reference or from the memo cache.
+
+_SIMPLE_TYPES = (int, float, complex, bool, type(None), str)
+
+# Instances of these types can't be modified, so classifying them never goes stale.
+_Py_TPFLAGS_HEAPTYPE = 1 << 9
+
+# type or "module.QualifiedName" -> (formatter, block), see register().
+_REGISTRY: dict[type | str, tuple[Callable[[Any], str], bool]] = {}
+
+# Types standing in for others, like the values rebuilt from binary records, see _binary.py. type -> (kind, to_text)
+STAND_INS: dict[type, tuple[int, Callable[[Any], str] | None]] = {}
+
+# How _ITERABLE values are rendered without the preview_items option.
+_REPR_DISPATCH = (_TEXT, repr, None, None, None)
+
+# type -> (kind, to_text, summarize, __repr__, __str__), see _get_dispatch().
+_KINDS: dict[
+    type,
+    tuple[int, Callable[[Any], str] | None, Callable[[Any], str] | None, Any, Any],
+] = {}
+# Caches per type hold on to their types, and classes made at runtime, like namedtuples made per request, could
+# produce endless types, so cap them.
+_TYPE_CACHE_MAX_SIZE = 4096
+
+
+def register(
+    cls: type | str,
+    formatter: Callable[[Any], str] | None = None,
+    *,
+    block: bool = False,
+):
+    """
+    Register a formatter for a type and its subclasses, which dbg() then uses instead of its default rendering.
+
+    `cls` can be a type, or the full name of a type like "cupy.ndarray", so the library defining it does not have to be
+    imported. `formatter` takes the value and returns its text, which may have multiple lines. If `block` is True,
+    the text is rendered as a block starting on its own line, like numpy arrays.
+
+    Can also be used as a decorator:
+
+        @register(Order)
+        def _format_order(order):
+            return "Order #%d, %d items" % (order.id, len(order.items))
+    """
+    if formatter is None:
+        return lambda formatter: register(cls, formatter, block=block)
+
+    _REGISTRY[cls] = (formatter, block)
+    # Subclasses of cls may have been classified, or even rendered, already.
+    _KINDS.clear()
+    RENDER_CACHE.clear()
+    return formatter
+
+
+def unregister(cls: type | str) -> None:
+    """Remove a formatter registered with register()."""
+    del _REGISTRY[cls]
+    _KINDS.clear()
+    RENDER_CACHE.clear()
+
+
+def _find_registered(cls: type) -> tuple[Callable[[Any], str], bool] | None:
+    """Find the registered formatter of the closest class in cls's MRO, if any."""
+    for base in cls.__mro__:
+        registered = _REGISTRY.get(base)
+        if registered is None:
+            registered = _REGISTRY.get("%s.%s" % (base.__module__, base.__qualname__))
+        if registered is not None:
+            return registered
+    return None
+
+
+def _classify(
+    cls: type,
+) -> tuple[int, Callable[[Any], str] | None, Callable[[Any], str] | None]:
+    """
+    Decide how instances of a type are rendered: kind, the function turning them into text if needed, and the function
+    summarizing them in one line, for data science containers, see the array_summary option.
+    """
+    stand_in = STAND_INS.get(cls)
+    if stand_in is not None:
+        return stand_in[0], stand_in[1], None
+    if _REGISTRY:
+        registered = _find_registered(cls)
+        if registered is not None:
+            formatter, block = registered
+            return (_ARRAY if block else _TEXT), formatter, None
+    if cls in _SIMPLE_TYPES:
+        return _SIMPLE, repr, None
+    if cls is bytes or cls is bytearray:
+        return _BUFFER, repr, None
+    if cls is memoryview:
+        return _BUFFER, iterable_preview(cls), None
+    if issubclass(cls, list):
+        return _LIST, None, None
+    if issubclass(cls, tuple):
+        if _is_namedtuple(cls):
+            return _OBJECT, _namedtuple_fields(cls), None
+        return _TUPLE, None, None
+    if issubclass(cls, set):
+        return _SET, None, None
+    if issubclass(cls, dict):
+        return _DICT, None, None
+    preview = iterable_preview(cls)
+    if preview is not None:
+        return _ITERABLE, preview, None
+    library = array_library(cls)
+    if library is not None:
+        return (_TENSOR if library == "torch" else _ARRAY), repr, SUMMARIZERS[library]
+    if _is_dataclass_with_generated_repr(cls):
+        return _OBJECT, _dataclass_fields(cls), None
+    if cls.__repr__ is not object.__repr__:
+        return _TEXT, repr, None
+    if cls.__str__ is not object.__str__ or cls.__module__ == "builtins":
+        return _TEXT, str, None
+    if "__attrs_attrs__" in cls.__dict__:
+        return _OBJECT, _attrs_fields(cls), None
+    return _OBJECT, _object_fields(cls), None
+
+
+def _get_dispatch(
+    cls: type,
+) -> tuple[int, Callable[[Any], str] | None, Callable[[Any], str] | None, Any, Any]:
+    """
+    Decide how instances of a type are rendered, cached per type. See _classify().
+
+    A cached decision is only reused as long as the type's __repr__ and __str__ stay the same, as they may be
+    replaced at runtime. Built-in types can't be changed, no need to check them.
+    """
+    entry = _KINDS.get(cls)
+    if entry is not None and (
+        entry[3] is None or (cls.__repr__ is entry[3] and cls.__str__ is entry[4])
+    ):
+        return entry
+
+    kind, to_text, summarize = _classify(cls)
+    if cls.__flags__ & _Py_TPFLAGS_HEAPTYPE:
+        entry = (kind, to_text, summarize, cls.__repr__, cls.__str__)
+    else:
+        entry = (kind, to_text, summarize, None, None)
+    if len(_KINDS) >= _TYPE_CACHE_MAX_SIZE:
+        _KINDS.clear()
+    _KINDS[cls] = entry
+    return entry
+
+
+# Marks a field without a value, like a slot never assigned.
+_UNSET = object()
+
+# type -> (size of the class dict, [(name, label)]) of its class variables, see _class_vars().
+_CLASS_VARS: dict[type, tuple[int, list[tuple[str, str]]]] = {}
+
+
+def _class_vars(cls: type) -> list[tuple[str, str]]:
+    """
+    Get the names of the class variables rendered with an object's fields, with their labels.
+    Cached per type, and scanned again only when variables are added to or removed from the class.
+    """
+    class_dict = cls.__dict__
+    cached = _CLASS_VARS.get(cls)
+    if cached is not None and cached[0] == len(class_dict):
+        return cached[1]
+
+    class_vars = []
+    for key, field in class_dict.items():
+        if key.startswith("__") and key.endswith("__"):
+            # Magic method, ignore
+            continue
+        if callable(field):
+            # Function, ignore
+            continue
+        if type(field).__name__ == "member_descriptor":
+            # A slot, rendered as an instance variable.
+            continue
+        class_vars.append((key, "%s.%s: " % (cls.__name__, key)))
+    if len(_CLASS_VARS) >= _TYPE_CACHE_MAX_SIZE:
+        _CLASS_VARS.clear()
+    _CLASS_VARS[cls] = (len(class_dict), class_vars)
+    return class_vars
+
+
+def _slot_names(cls: type) -> list[tuple[str, str]]:
+    """Get the (attribute name, label) pairs of all slots of a class, including those of its base classes."""
+    slots = []
+    for base in reversed(cls.__mro__):
+        base_slots = base.__dict__.get("__slots__", ())
+        if isinstance(base_slots, str):
+            base_slots = (base_slots,)
+        for name in base_slots:
+            if name in ("__dict__", "__weakref__"):
+                continue
+            attribute = name
+            if name.startswith("__") and not name.endswith("__"):
+                # Private names are mangled.
+                attribute = "_%s%s" % (base.__name__.lstrip("_"), name)
+            slots.append((attribute, "%s: " % (name,)))
+    return slots
+
+
+def _object_fields(cls: type) -> Callable[[Any], list[tuple[str, Any]]]:
+    """
+    Make the function getting the fields of a plain object: its instance variables, slots and class variables.
+    """
+    slots = _slot_names(cls)
+    has_dict = cls.__dictoffset__ != 0
+
+    def fields(obj: Any) -> list[tuple[str, Any]]:
+        # Handle instance variables.
+        instance_vars = obj.__dict__ if has_dict else {}
+        entries = [("%s: " % (key,), field) for key, field in instance_vars.items()]
+        for attribute, label in slots:
+            field = getattr(obj, attribute, _UNSET)
+            if field is not _UNSET:
+                entries.append((label, field))
+
+        # Handle class variables.
+        class_dict = cls.__dict__
+        for key, label in _class_vars(cls):
+            if key in instance_vars:
+                # A class variable has the same name as instance variable, ignore.
+                continue
+            field = class_dict.get(key, _UNSET)
+            if field is not _UNSET:
+                entries.append((label, field))
+        return entries
+
+    return fields
+
+
+def _named_fields(names: list[str]) -> Callable[[Any], list[tuple[str, Any]]]:
+    """Make the function getting the named attributes of an object, like the fields of a dataclass."""
+    labels = [(name, "%s: " % (name,)) for name in names]
+
+    def fields(obj: Any) -> list[tuple[str, Any]]:
+        entries = []
+        for name, label in labels:
+            field = getattr(obj, name, _UNSET)
+            if field is not _UNSET:
+                entries.append((label, field))
+        return entries
+
+    return fields
+
+
+def _namedtuple_fields(cls: type) -> Callable[[Any], list[tuple[str, Any]]]:
+    labels = ["%s: " % (name,) for name in cls._fields]
+
+    def fields(obj: Any) -> list[tuple[str, Any]]:
+        return list(zip(labels, obj))
+
+    return fields
+
+
+def _is_namedtuple(cls: type) -> bool:
+    """Check if the class is made by collections.namedtuple() or typing.NamedTuple, and keeps its __repr__."""
+    return (
+        isinstance(getattr(cls, "_fields", None), tuple)
+        and cls.__repr__.__module__ == "collections"
+    )
+
+
+def _is_dataclass_with_generated_repr(cls: type) -> bool:
+    if not hasattr(cls, "__dataclass_fields__"):
+        return False
+    repr_function = cls.__repr__
+    if repr_function is object.__repr__:
+        return True
+    # The __repr__ generated by @dataclass is compiled from a string, and wrapped to guard against recursion. A
+    # handwritten one may be wrapped the same way, by reprlib.recursive_repr().
+    while hasattr(repr_function, "__wrapped__"):
+        repr_function = repr_function.__wrapped__
+    code = getattr(repr_function, "__code__", None)
+    return code is not None and code.co_filename == "<string>"
+
+
+def _dataclass_fields(cls: type) -> Callable[[Any], list[tuple[str, Any]]]:
+    # dataclasses must have been imported to make cls.
+    dataclasses = sys.modules["dataclasses"]
+    return _named_fields([f.name for f in dataclasses.fields(cls) if f.repr])
+
+
+def _attrs_fields(cls: type) -> Callable[[Any], list[tuple[str, Any]]]:
+    return _named_fields([a.name for a in cls.__attrs_attrs__ if a.repr])
+
+
+def object_entries(obj: Any) -> list[tuple[str, Any]]:
+    """
+    Get the fields of an object rendered as _OBJECT, as (label, value) pairs, where labels look like "name: ".
+    """
+    return _get_dispatch(type(obj))[1](obj)
+
+
+def _delete_special_characters(string: str) -> str:
+    """
+    Delete control characters like '\b'
+    """
+    return _CONTROL_CHAR_RE.sub("", string)
+
+
+def _indent_multiline_str(string: str, level: int) -> str:
+    """
+    Apply additional indent to a possibly already formatted, multiline representation.
+    """
+    lines = string.splitlines(keepends=True)
+    if not lines:
+        return ""
+
+    # No need to indent the first line.
+    if len(lines) == 1:
+        return _delete_special_characters(lines[0].rstrip("\n\r"))
+
+    # Add indent.
+    indent = "\n" + _get_indent(level)
+    return indent.join(
+        _delete_special_characters(line.rstrip("\n\r")) for line in lines
+    )
+
+
+# Kinds of entries a container frame iterates over.
+_VALUES = 0  # Plain values, as in lists, sets and tuples.
+_ITEMS = 1  # (key, value) pairs, as in dict.items().
+_LABELED = 2  # (label, value) pairs, where the label is already formatted.
+
+# Marks that there is no value waiting to be rendered.
+_NOTHING = object()
+
+
+class _Frame:
+    """
+    A container being rendered, see render_human_readable_repr().
+    The first entry is written after `prefix`, which is then replaced by `separator`, e.g. ",\n    ".
+    If some entries are left out because of max_items, `elision` is written as the last entry.
+    """
+
+    __slots__ = (
+        "entries",
+        "kind",
+        "level",
+        "prefix",
+        "separator",
+        "closing",
+        "ml_container_new_line",
+        "obj_id",
+        "elision",
+    )
+
+    def __init__(
+        self,
+        entries: Iterator,
+        kind: int,
+        level: int,
+        separator: str,
+        closing: str,
+        ml_container_new_line: bool,
+        obj_id: int,
+        elision: str | None,
+    ):
+        indent = _get_indent(level + 1)
+        self.entries = entries
+        self.kind = kind
+        self.level = level
+        self.prefix = indent
+        self.separator = separator + indent
+        self.closing = "\n" + _get_indent(level) + closing
+        self.ml_container_new_line = ml_container_new_line
+        self.obj_id = obj_id
+        self.elision = elision
+
+
+def _elide(entries: Iterable, count: int, max_items: int | None, noun: str):
+    """
+    Apply max_items to the entries of a container holding `count` entries.
+    Returns the entries to render, and the elision marker if some are left out.
+    """
+    if max_items is None or count <= max_items:
+        return iter(entries), None
+    return (
+        islice(entries, max_items),
+        "... %s more %s" % (format(count - max_items, ","), noun),
+    )
+
+
+def _collapse(count: int, noun: str) -> str:
+    """One line summary of a container too deep to be rendered, see max_depth."""
+    return "... %s %s" % (format(count, ","), noun)
+
+
+def _truncated_text(
+    value: Any, to_text: Callable[[Any], str], max_string: int | None
+) -> str:
+    """
+    Get the text representation of a value, truncated to max_string characters.
+    Strings and bytes are sliced before being converted, so a huge one is never copied as a whole.
+    """
+    if max_string is None:
+        return to_text(value)
+
+    if isinstance(value, (str, bytes, bytearray)) and len(value) > max_string:
+        text = to_text(value[:max_string])
+        omitted = len(value) - max_string
+    else:
+        text = to_text(value)
+        omitted = len(text) - max_string
+        if omitted <= 0:
+            return text
+        text = text[:max_string]
+    return "%s... %s more characters" % (text, format(omitted, ","))
+
+
+def find_shared(objs: Iterable, options: Options) -> set[int]:
+    """
+    Find the containers and objects reachable more than once from the given objects, the arguments of a dbg() call,
+    other than through cyclic references, i.e. those render_human_readable_repr() would render more than once. Entries
+    left out by max_items, and containers collapsed by max_depth, don't count.
+
+    Walks in the same order as render_human_readable_repr(), but never enters a container twice.
+    """
+    max_items = options.max_items
+    max_depth = options.max_depth
+    limit = preview_limit(options)
+    previews = options.preview_items is not None
+    get_dispatch = _get_dispatch
+
+    seen: set[int] = set()
+    shared: set[int] = set()
+    recursion_path: set[int] = set()
+    # (values, id, level) of the containers being walked.
+    stack: list[tuple[Iterator, int, int]] = []
+
+    objs = iter(objs)
+    value, level = _NOTHING, 0
+    while True:
+        if value is not _NOTHING:
+            dispatch = get_dispatch(type(value))
+            kind = dispatch[0]
+            if (kind <= _OBJECT or (kind == _ITERABLE and previews)) and (
+                max_depth is None or level < max_depth
+            ):
+                obj_id = id(value)
+                if obj_id in recursion_path:
+                    pass
+                elif obj_id in seen:
+                    shared.add(obj_id)
+                else:
+                    seen.add(obj_id)
+                    if kind == _DICT:
+                        values = value.values()
+                    elif kind == _OBJECT:
+                        values = (field for _, field in object_entries(value))
+                    elif kind == _ITERABLE:
+                        _, values, _, pairs = dispatch[1](value)
+                        values = iter_preview(values, limit)
+                        if pairs:
+                            values = (field for _, field in values)
+                    else:
+                        values = value
+                    if max_items is not None:
+                        values = islice(values, max_items)
+                    recursion_path.add(obj_id)
+                    stack.append((iter(values), obj_id, level))
+
+        if not stack:
+            # Move on to the next object.
+            value = next(objs, _NOTHING)
+            if value is _NOTHING:
+                return shared
+            level = 0
+            continue
+
+        values, obj_id, parent_level = stack[-1]
+        value = next(values, _NOTHING)
+        if value is _NOTHING:
+            recursion_path.remove(obj_id)
+            stack.pop()
+            continue
+        level = parent_level + 1
+
+
+class SharedReferences:
+    """
+    The containers and objects a dbg() call renders more than once, found across all of its arguments, and the anchors
+    of those rendered so far, see the dedup option. Anchors are numbered across the arguments.
+    """
+
+    __slots__ = ("shared", "anchors")
+
+    def __init__(self, objs: Iterable, options: Options):
+        self.shared = find_shared(objs, options)
+        self.anchors: dict[int, int] = {}
+
+
+def shared_references(objs: tuple, options: Options) -> SharedReferences | None:
+    """Find the references shared by the arguments of a dbg() call, if the dedup option is on."""
+    return SharedReferences(objs, options) if options.dedup else None
+
+
+def render_human_readable_repr(
+    obj: Any,
+    write: Callable[[str], Any],
+    options: Options = config,
+    references: SharedReferences | None = None,
+) -> None:
+    """
+    Render the dbg representation of an object, see get_human_readable_repr(), and feed it to `write` piece by piece.
+    If the object is one of several arguments of a dbg() call, `references` are those shared by all of them.
+
+    Nested values are handled with an explicit stack instead of recursion, so arbitrarily deep structures (think of a
+    linked list with thousands of nodes) never hit the recursion limit, and each piece of output is written exactly
+    once, no matter how deep it is nested.
+
+    Every container being rendered has a _Frame on the stack, which remembers how far its entries have been rendered.
+    """
+    _render(obj, write, options, 0, True, references)
+
+
+def _render(
+    obj: Any,
+    write: Callable[[str], Any],
+    options: Options,
+    level: int,
+    ml_container_new_line: bool,
+    references: SharedReferences | None = None,
+) -> None:
+    """See render_human_readable_repr(), obj is rendered as if it were nested `level` levels deep."""
+    max_items = options.max_items
+    max_depth = options.max_depth
+    max_string = options.max_string
+    array_summary = options.array_summary
+    tensor_data = options.tensor_data
+    limit = preview_limit(options)
+    previews = options.preview_items is not None
+    hexdump = options.hexdump
+    get_dispatch = _get_dispatch
+
+    # Backtracking algorithm to detect cyclic reference, ids of the containers being rendered.
+    recursion_path: set[int] = set()
+    stack: list[_Frame] = []
+
+    # Ids of the containers rendered more than once, and the anchors of those already rendered, see the dedup option.
+    shared = None
+    if options.dedup:
+        if references is None:
+            references = SharedReferences((obj,), options)
+        shared = references.shared
+        anchors = references.anchors
+
+    # Renderings of immutable values depend on these options, and where they are nested, see the memoize option.
+    # Shared references are found anew in every call, so they can't be memoized.
+    memo_options = None
+    if options.memoize and shared is None:
+        memo_options = (
+            max_items,
+            max_depth,
+            max_string,
+            array_summary,
+            tensor_data,
+            hexdump,
+            options.checksum,
+        )
+
+    value = obj
+    while True:
+        if value is not _NOTHING:
+            frame = None
+            dispatch = get_dispatch(type(value))
+            kind = dispatch[0]
+
+            if (
+                shared
+                and id(value) in shared
+                and id(value) not in recursion_path
+                and (max_depth is None or level < max_depth)
+            ):
+                anchor = anchors.get(id(value))
+                if anchor is None:
+                    anchor = anchors[id(value)] = len(anchors) + 1
+                    write("&%d " % anchor)
+                else:
+                    write("*%d" % anchor)
+                    kind = _WRITTEN
+
+            if (
+                memo_options is not None
+                and (kind == _TUPLE or kind == _TEXT or kind == _OBJECT)
+                and is_memo_candidate(value)
+            ):
+                text = RENDER_CACHE.render(
+                    (id(value), level, ml_container_new_line, memo_options),
+                    value,
+                    options.memo_size,
+                    lambda value: _render_to_str(
+                        value, options, level, ml_container_new_line
+                    ),
+                )
+                if text is not None:
+                    write(text)
+                    kind = _WRITTEN
+
+            if kind == _BUFFER:
+                if hexdump is not None:
+                    write(
+                        _indent_multiline_str(
+                            format_hexdump(value, hexdump, options.checksum), level
+                        )
+                    )
+                    kind = _WRITTEN
+                elif type(value) is memoryview and previews:
+                    kind = _ITERABLE
+                else:
+                    # repr() of bytes, bytearray and memoryview is a single line without control characters.
+                    kind = _SIMPLE
+            elif kind == _ITERABLE and not previews:
+                # Looking into each item of a huge deque costs a lot more than its repr() does.
+                dispatch = _REPR_DISPATCH
+                kind = _TEXT
+
+            if kind == _SIMPLE:
+                if max_string is None:
+                    write(repr(value))
+                else:
+                    write(_truncated_text(value, repr, max_string))
+            elif kind == _TEXT:
+                write(
+                    _indent_multiline_str(
+                        _truncated_text(value, dispatch[1], max_string), level
+                    )
+                )
+            elif kind == _ARRAY or kind == _TENSOR:
+                if kind == _TENSOR and not tensor_reads_data(value, tensor_data):
+                    # repr() of a GPU tensor waits for the device and copies the tensor to the host.
+                    write(summarize_tensor(value, read_data=False))
+                elif array_summary and dispatch[2] is not None:
+                    # One line of metadata and statistics instead of the full repr(), which is slow for big arrays.
+                    write(dispatch[2](value))
+                else:
+                    text = _truncated_text(value, dispatch[1], max_string)
+                    if level == 0:
+                        write("\n")
+                        write(_indent_multiline_str(text, level))
+                    elif ml_container_new_line:
+                        write("\n")
+                        write(_get_indent(level + 1))
+                        write(_indent_multiline_str(text, level + 1))
+                    else:
+                        write(_indent_multiline_str(text, level))
+            elif kind == _WRITTEN:
+                pass
+            elif id(value) in recursion_path:
+                if kind == _LIST:
+                    write("[...]")
+                elif kind == _DICT:
+                    write("{...}")
+                else:
+                    write("CYCLIC REFERENCE")
+
+            # Handle data containers.
+            elif kind <= _SET:
+                if kind == _LIST:
+                    opening, closing = "[", "]"
+                elif kind == _TUPLE:
+                    opening, closing = "(", ")"
+                else:
+                    opening, closing = "{", "}"
+                if max_depth is not None and level >= max_depth:
+                    write(opening + _collapse(len(value), "items") + closing)
+                else:
+                    # <num_of_ident><val>
+                    write(opening + "\n")
+                    entries, elision = _elide(value, len(value), max_items, "items")
+                    frame = _Frame(
+                        entries,
+                        _VALUES,
+                        level,
+                        ",\n",
+                        closing,
+                        False,
+                        id(value),
+                        elision,
+                    )
+            elif kind == _DICT:
+                if max_depth is not None and level >= max_depth:
+                    write("{" + _collapse(len(value), "items") + "}")
+                else:
+                    # <num_of_ident><key>: <val>
+                    write("{\n")
+                    entries, elision = _elide(
+                        value.items(), len(value), max_items, "items"
+                    )
+                    frame = _Frame(
+                        entries, _ITEMS, level, ",\n", "}", True, id(value), elision
+                    )
+            elif kind == _ITERABLE:
+                name, entries, count, pairs = dispatch[1](value)
+                opening, closing = ("{", "}") if pairs else ("[", "]")
+                if max_depth is not None and level >= max_depth:
+                    summary = "..." if count is None else _collapse(count, "items")
+                    write("%s %s%s%s" % (name, opening, summary, closing))
+                else:
+                    # <name> [<num_of_ident><val>, ...]
+                    write("%s %s\n" % (name, opening))
+                    if count is None:
+                        # Only the first items of an iterator are known.
+                        elision = "... more items"
+                    elif limit is not None and count > limit:
+                        elision = "... %s more items" % format(count - limit, ",")
+                    else:
+                        elision = None
+                    frame = _Frame(
+                        iter_preview(entries, limit),
+                        _ITEMS if pairs else _VALUES,
+                        level,
+                        ",\n",
+                        closing,
+                        pairs,
+                        id(value),
+                        elision,
+                    )
+            else:
+                # Just an object without __repr__ or __str__ provided, or one whose fields are known.
+                entries = dispatch[1](value)
+                cls = value.__class__
+                write(cls.__name__)
+                if max_depth is not None and level >= max_depth:
+                    write(" {" + _collapse(len(entries), "fields") + "}")
+                elif entries:
+                    write(" {\n")
+                    entries, elision = _elide(
+                        entries, len(entries), max_items, "fields"
+                    )
+                    frame = _Frame(
+                        entries, _LABELED, level, "\n", "}", True, id(value), elision
+                    )
+                else:
+                    write(" {\n")
+                    write(_get_indent(level))
+                    write("}")
+
+            if frame is not None:
+                recursion_path.add(frame.obj_id)
+                stack.append(frame)
+
+        if not stack:
+            return
+
+        # Move on to the next entry of the innermost container.
+        frame = stack[-1]
+        entry = next(frame.entries, _NOTHING)
+        if entry is _NOTHING:
+            if frame.elision is not None:
+                write(frame.prefix)
+                write(frame.elision)
+            write(frame.closing)
+            recursion_path.remove(frame.obj_id)
+            stack.pop()
+            value = _NOTHING
+            continue
+
+        write(frame.prefix)
+        frame.prefix = frame.separator
+        entry_kind = frame.kind
+        if entry_kind == _VALUES:
+            value = entry
+        elif entry_kind == _ITEMS:
+            write("%s: " % (entry[0],))
+            value = entry[1]
+        else:
+            write(entry[0])
+            value = entry[1]
+        level = frame.level + 1
+        ml_container_new_line = frame.ml_container_new_line
+
+
+def _render_to_str(
+    obj: Any, options: Options, level: int, ml_container_new_line: bool
+) -> str:
+    """Render a value nested `level` levels deep to a string, without memoizing the values it holds."""
+    options = options.override(memoize=False)
+    fragments: list[str] = []
+    _render(obj, fragments.append, options, level, ml_container_new_line)
+    return "".join(fragments)
+
+
+def get_human_readable_repr(obj: Any, options: Options = config) -> str:
+    """
+    Get a useful dbg representation of an object.
+
+    By default, python just prints things like '<__main__.Linkedlist object at 0x102c47560>', which is useless.
+    This function returns things like:
+    Linkedlist {
+        start: Node {
+            val: 0,
+            next: Node {
+                val: 1,
+                next: Node {
+                    val: 2,
+                    next: None,
+                }
+            }
+        }
+    }
+    """
+    fragments: list[str] = []
+    render_human_readable_repr(obj, fragments.append, options)
+    return "".join(fragments)
@@ -0,0 +1,119 @@
+"""
+Iterables other than lists, tuples, sets and dicts: deques, dict views, arrays, memoryviews, and iterators passed to
+dbg(), see the preview_items option.
+
+Each of them is previewed by a function returning its type name, its entries, how many entries it has in total, or
+None if that is unknown, and whether the entries are (key, value) pairs, like dict_items. The entries are iterated
+lazily, so rendering the first few of a huge deque costs the same as rendering a small one.
+"""
+
+from array import array
+from collections import deque
+from itertools import chain, islice
+from typing import Any, Callable, Iterable, Iterator
+
+from ._config import Options
+
+Preview = tuple[str, Iterable, int | None, bool]
+
+_DICT_VIEWS = (type({}.keys()), type({}.values()))
+_DICT_ITEMS = type({}.items())
+
+# Iterators of these modules are known to have no side effect other than being advanced, unlike files for example.
+_ITERATOR_MODULES = ("builtins", "itertools")
+
+
+class IteratorPreview:
+    """
+    The first items of an iterator passed to dbg(), rendered in its place. dbg() returns
+    `chain(preview.head, iterator)` instead of the iterator, so the caller still gets every item.
+    """
+
+    __slots__ = ("cls", "head", "exhausted")
+
+    def __init__(self, cls: type, head: list, exhausted: bool):
+        self.cls = cls
+        self.head = head
+        self.exhausted = exhausted
+
+
+def _preview_sized(iterable: Any) -> Preview:
+    return type(iterable).__name__, iterable, len(iterable), False
+
+
+def _preview_items(items: Any) -> Preview:
+    return type(items).__name__, items, len(items), True
+
+
+def _preview_array(items: array) -> Preview:
+    return "%s(%r)" % (type(items).__name__, items.typecode), items, len(items), False
+
+
+def _preview_memoryview(view: memoryview) -> Preview:
+    if view.ndim == 1:
+        return "memoryview", view, len(view), False
+    # Only one dimensional views can be iterated.
+    items = view.tolist()
+    if view.ndim == 0:
+        items = [items]
+    return "memoryview", items, len(items), False
+
+
+def _preview_iterator(preview: IteratorPreview) -> Preview:
+    count = len(preview.head) if preview.exhausted else None
+    return preview.cls.__name__, preview.head, count, False
+
+
+def iterable_preview(cls: type) -> Callable[[Any], Preview] | None:
+    """Get the function previewing instances of a type, if they are rendered as iterables."""
+    if issubclass(cls, deque) or issubclass(cls, _DICT_VIEWS):
+        return _preview_sized
+    if issubclass(cls, _DICT_ITEMS):
+        return _preview_items
+    if issubclass(cls, array):
+        return _preview_array
+    if issubclass(cls, memoryview):
+        return _preview_memoryview
+    if cls is IteratorPreview:
+        return _preview_iterator
+    return None
+
+
+def preview_limit(options: Options) -> int | None:
+    """How many entries of an iterable are rendered at most, see the max_items and preview_items options."""
+    max_items = options.max_items
+    preview_items = options.preview_items
+    if preview_items is None:
+        return max_items
+    if max_items is None:
+        return preview_items
+    return min(max_items, preview_items)
+
+
+def preview_iterators(evaluated_args: tuple, preview_items: int) -> tuple[tuple, tuple]:
+    """
+    Take the first items of the iterators among the arguments of a dbg() call. Returns the arguments to render, with
+    IteratorPreview in place of the iterators, and the arguments to return, with the iterators chained after their
+    first items.
+    """
+    rendered_args = None
+    returned_args = None
+    for i, arg in enumerate(evaluated_args):
+        cls = type(arg)
+        if not hasattr(cls, "__next__") or cls.__module__ not in _ITERATOR_MODULES:
+            continue
+        if rendered_args is None:
+            rendered_args = list(evaluated_args)
+            returned_args = list(evaluated_args)
+        # One more item than shown, to tell if there are more.
+        head = list(islice(arg, preview_items + 1))
+        rendered_args[i] = IteratorPreview(cls, head, len(head) <= preview_items)
+        returned_args[i] = chain(head, arg)
+    if rendered_args is None:
+        return evaluated_args, evaluated_args
+    return tuple(rendered_args), tuple(returned_args)
+
+
+def iter_preview(entries: Iterable, limit: int | None) -> Iterator:
+    """Iterate over the first `limit` entries of an iterable, all of them if limit is None."""
+    return iter(entries) if limit is None else islice(entries, limit)
@@ -0,0 +1,115 @@
+"""
+JSON Lines output, see the output_format option.
+"""
+
+import threading
+from time import time
+from typing import Any
+
+from ._config import Options
+from ._format import render_human_readable_repr, shared_references
+from ._iterables import IteratorPreview
+from ._output import current_task_name
+
+# Created on first use, so importing crab_dbg does not import json.
+_ENCODER = None
+
+
+def _get_encoder():
+    global _ENCODER
+    if _ENCODER is None:
+        import json
+
+        # Records are flat dicts of str and numbers, no need to check for cycles. Compact separators keep lines short.
+        _ENCODER = json.JSONEncoder(
+            ensure_ascii=False, check_circular=False, separators=(",", ":")
+        )
+    return _ENCODER
+
+
+def _context() -> dict[str, Any]:
+    """The keys telling when and by whom a record is written: ts (wall clock time), thread, and task if any."""
+    context: dict[str, Any] = {"ts": time(), "thread": threading.current_thread().name}
+    task_name = current_task_name()
+    if task_name is not None:
+        context["task"] = task_name
+    return context
+
+
+def _type_name(cls: type) -> str:
+    if cls.__module__ == "builtins":
+        return cls.__qualname__
+    return "%s.%s" % (cls.__module__, cls.__qualname__)
+
+
+def format_json_records(
+    file: str,
+    line: int,
+    col: int,
+    raw_args: list[str],
+    evaluated_args: tuple,
+    options: Options,
+) -> str:
+    """
+    Format one dbg() call as JSON Lines, one object per argument, like:
+
+        {"file":"main.py","line":3,"col":1,"expr":"a","type":"int","value":"1","ts":1700000000.123456,"thread":"MainThread"}
+
+    `value` is the same text dbg() prints in text mode, and `ts` is the wall clock time. A call without arguments is a
+    single record without `expr`, `type` and `value`.
+    """
+    encode = _get_encoder().encode
+    context = _context()
+
+    if not raw_args:
+        return encode({"file": file, "line": line, "col": col, **context}) + "\n"
+
+    lines = []
+    references = shared_references(evaluated_args, options)
+    for raw_arg, evaluated_arg in zip(raw_args, evaluated_args):
+        fragments: list[str] = []
+        render_human_readable_repr(evaluated_arg, fragments.append, options, references)
+        record = {
+            "file": file,
+            "line": line,
+            "col": col,
+            "expr": raw_arg,
+            "type": _type_name(
+                evaluated_arg.cls
+                if type(evaluated_arg) is IteratorPreview
+                else type(evaluated_arg)
+            ),
+            # Blocks like numpy arrays start on a new line in text mode, no need for that here.
+            "value": "".join(fragments).lstrip("\n"),
+        }
+        record.update(context)
+        lines.append(encode(record))
+    lines.append("")
+    return "\n".join(lines)
+
+
+def format_json_span(
+    location: tuple[str, int, int],
+    labels: tuple[str, ...],
+    text: str,
+    wall_ns: int,
+    cpu_ns: int,
+) -> str:
+    """
+    Format the timing of a span or a traced call, see dbg.span(), as one JSON Lines record, like:
+
+        {"file":"main.py","line":3,"col":6,"span":"load","parents":[],"wall_ns":12345000,"cpu_ns":11002000,"ts":...}
+
+    `parents` are the labels of the spans and calls it is nested in, outermost first.
+    """
+    record = {
+        "file": location[0],
+        "line": location[1],
+        "col": location[2],
+        "span": text,
+        "parents": list(labels),
+        "wall_ns": wall_ns,
+        "cpu_ns": cpu_ns,
+    }
+    record.update(_context())
+    return _get_encoder().encode(record) + "\n"
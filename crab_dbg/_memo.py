@@ -0,0 +1,144 @@
+from collections import OrderedDict, namedtuple
+from enum import Enum
+import threading
+from typing import Any, Callable
+
+RenderCacheInfo = namedtuple(
+    "RenderCacheInfo", ["hits", "misses", "maxsize", "currsize"]
+)
+
+# Types that can't hold anything mutable.
+_IMMUTABLE_TYPES = frozenset(
+    (int, float, complex, bool, type(None), str, bytes, range, type(Ellipsis))
+)
+
+# Smaller tuples and frozensets are cheaper to render than to look up.
+MEMO_MIN_ITEMS = 16
+
+# type -> whether its instances may be memoized, see is_memo_candidate(). Capped, like the type caches of _format.py.
+_CANDIDATE_TYPES: dict[type, bool] = {}
+_CANDIDATE_TYPES_MAX_SIZE = 4096
+
+
+def _is_frozen_dataclass(cls: type) -> bool:
+    params = getattr(cls, "__dataclass_params__", None)
+    return params is not None and params.frozen
+
+
+def is_memo_candidate(value: Any) -> bool:
+    """
+    Tell if the rendering of a value is worth memoizing: large tuples and frozensets, enum members and frozen
+    dataclasses. Whether it really is immutable is checked by is_immutable().
+    """
+    cls = type(value)
+    candidate = _CANDIDATE_TYPES.get(cls)
+    if candidate is None:
+        if len(_CANDIDATE_TYPES) >= _CANDIDATE_TYPES_MAX_SIZE:
+            _CANDIDATE_TYPES.clear()
+        candidate = _CANDIDATE_TYPES[cls] = issubclass(
+            cls, (tuple, frozenset, Enum)
+        ) or _is_frozen_dataclass(cls)
+    if not candidate:
+        return False
+    if isinstance(value, (tuple, frozenset)):
+        return len(value) >= MEMO_MIN_ITEMS
+    return True
+
+
+def is_immutable(value: Any) -> bool:
+    """
+    Tell if a value, and everything it holds, can never change, so its rendering never goes stale.
+    """
+    stack = [value]
+    seen: set[int] = set()
+    while stack:
+        value = stack.pop()
+        cls = type(value)
+        if cls in _IMMUTABLE_TYPES or id(value) in seen:
+            continue
+        seen.add(id(value))
+        if cls is tuple or cls is frozenset:
+            stack.extend(value)
+        elif issubclass(cls, Enum):
+            # Members are singletons, but their repr() shows their value.
+            stack.append(value.value)
+        elif issubclass(cls, (tuple, frozenset)) and not hasattr(value, "__dict__"):
+            # e.g. namedtuples.
+            stack.extend(value)
+        elif _is_frozen_dataclass(cls):
+            stack.extend(getattr(value, name) for name in cls.__dataclass_fields__)
+        else:
+            return False
+    return True
+
+
+class _RenderCache:
+    """
+    Process wide LRU cache of rendered immutable values, see the memoize option.
+
+    Keys are (id, nesting level, ...) tuples. An entry holds a strong reference to its value, so the id can't be
+    reused by another object while the entry exists. Values found not to be immutable are remembered too, with
+    None as their text, so they are not checked again.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.maxsize = 0
+        # key -> (value, text)
+        self._entries: OrderedDict[tuple, tuple[Any, str | None]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def render(
+        self, key: tuple, value: Any, maxsize: int, render: Callable[[Any], str]
+    ) -> str | None:
+        """
+        Get the text of a value, rendering it with `render` on a miss. Returns None if the value is not immutable,
+        it has to be rendered every time then.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        text = render(value) if is_immutable(value) else None
+
+        with self._lock:
+            self.maxsize = maxsize
+            self._entries[key] = (value, text)
+            while len(self._entries) > maxsize:
+                self._entries.popitem(last=False)
+        return text
+
+    def cache_info(self) -> RenderCacheInfo:
+        with self._lock:
+            return RenderCacheInfo(
+                self.hits, self.misses, self.maxsize, len(self._entries)
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+RENDER_CACHE = _RenderCache()
+
+
+def render_cache_info() -> RenderCacheInfo:
+    """
+    Report hits, misses, maximum size and current size (both in entries) of crab_dbg's cache of rendered immutable
+    values, see the memoize option.
+    """
+    return RENDER_CACHE.cache_info()
+
+
+def clear_render_cache() -> None:
+    """
+    Drop all cached renderings and reset the hit and miss counters.
+    """
+    RENDER_CACHE.clear()
@@ -0,0 +1,257 @@
+import atexit
+import queue
+import sys
+import threading
+from time import monotonic
+from typing import Any, Callable, TextIO
+
+from ._config import Options
+
+
+# Serializes writes of different threads, so the output of one dbg() call is never torn apart.
+# Only writing takes this lock, formatting does not. Reentrant, in case a file's write() itself calls dbg().
+WRITE_LOCK = threading.RLock()
+
+# Streamed output is handed to the underlying file in chunks of about this many characters.
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+class ChunkedWriter:
+    """
+    Collect small fragments of output and hand them to `write` in chunks of about `chunk_size` characters, so
+    streaming a huge representation neither builds it as a whole in memory nor makes one write call per fragment.
+    """
+
+    __slots__ = ("_write", "_chunk_size", "_fragments", "_size")
+
+    def __init__(
+        self, write: Callable[[str], Any], chunk_size: int = DEFAULT_CHUNK_SIZE
+    ):
+        self._write = write
+        self._chunk_size = chunk_size
+        self._fragments: list[str] = []
+        self._size = 0
+
+    def write(self, fragment: str) -> None:
+        self._fragments.append(fragment)
+        self._size += len(fragment)
+        if self._size >= self._chunk_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Hand everything collected so far to the underlying write."""
+        if self._fragments:
+            self._write("".join(self._fragments))
+            self._fragments.clear()
+            self._size = 0
+
+
+class BackgroundWriter:
+    """
+    Write output on a background thread, so dbg() never blocks on slow I/O, like a stderr piped to a log collector.
+
+    Records are put onto a bounded queue. When it is full, depending on `overflow`, dbg() either waits for a free slot
+    ("block"), or throws the record away and counts it ("drop"). The thread writes records in batches, one write()
+    call for each run of consecutive records to the same file.
+
+    Once closed, it takes no more records, put() returns False instead, so they go to whichever writer replaced it.
+    """
+
+    # Most records written in one batch.
+    BATCH_SIZE = 256
+
+    def __init__(self, queue_size: int, overflow: str):
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.dropped = 0
+        self.closed = False
+        # Taken by put() and close(), so nothing is put after the sentinel which stops the thread.
+        self._lock = threading.Lock()
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(
+            target=self._run, name="crab_dbg writer", daemon=True
+        )
+        self._thread.start()
+
+    def put(self, file: TextIO, text: str, flush: bool) -> bool:
+        """Queue a record, or drop it if the queue is full and overflow is "drop". Returns False once closed."""
+        record = (file, text, flush)
+        while True:
+            with self._lock:
+                if self.closed:
+                    return False
+                try:
+                    self._queue.put_nowait(record)
+                    return True
+                except queue.Full:
+                    if self.overflow == "drop":
+                        self.dropped += 1
+                        return True
+            # Wait for a free slot without the lock, so close() is not held up. A slot freed just before is only
+            # noticed after the timeout.
+            with self._queue.not_full:
+                self._queue.not_full.wait(0.01)
+
+    def flush(self) -> None:
+        """Wait until everything queued so far has been written."""
+        self._queue.join()
+
+    def close(self) -> None:
+        """Write everything queued so far, then stop the thread."""
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+            # A producer waiting in put() may take the wakeup meant for this, so the wait is timed too.
+            while True:
+                try:
+                    self._queue.put(None, timeout=0.01)
+                    break
+                except queue.Full:
+                    pass
+        self._thread.join()
+
+    def _run(self) -> None:
+        get = self._queue.get
+        get_nowait = self._queue.get_nowait
+        while True:
+            batch = [get()]
+            try:
+                while len(batch) < self.BATCH_SIZE and batch[-1] is not None:
+                    batch.append(get_nowait())
+            except queue.Empty:
+                pass
+
+            stop = batch[-1] is None
+            if stop:
+                batch.pop()
+            self._write_batch(batch)
+            for _ in range(len(batch) + stop):
+                self._queue.task_done()
+            if stop:
+                return
+
+    @staticmethod
+    def _write_batch(batch: list[tuple[TextIO, str, bool]]) -> None:
+        start = 0
+        while start < len(batch):
+            file = batch[start][0]
+            stop = start + 1
+            while stop < len(batch) and batch[stop][0] is file:
+                stop += 1
+            try:
+                file.write("".join(record[1] for record in batch[start:stop]))
+                if any(record[2] for record in batch[start:stop]):
+                    file.flush()
+            except Exception as e:
+                # Nobody to report to but the original stderr, the application must not be affected.
+                print("crab_dbg: cannot write output, %r" % (e,), file=sys.__stderr__)
+            start = stop
+
+
+_background_writer: BackgroundWriter | None = None
+_background_writer_lock = threading.Lock()
+
+
+def get_background_writer(queue_size: int, overflow: str) -> BackgroundWriter:
+    """
+    Get the background writer, starting it on first use.
+    If the queue settings have changed since it was started, it is replaced by a new one.
+    """
+    global _background_writer
+    writer = _background_writer
+    if (
+        writer is not None
+        and writer.queue_size == queue_size
+        and writer.overflow == overflow
+    ):
+        return writer
+
+    with _background_writer_lock:
+        # Another thread may have replaced it meanwhile.
+        writer = _background_writer
+        if writer is None:
+            atexit.register(stop_background_writer)
+        elif writer.queue_size == queue_size and writer.overflow == overflow:
+            return writer
+        else:
+            writer.close()
+        _background_writer = BackgroundWriter(queue_size, overflow)
+        return _background_writer
+
+
+def flush_background_writer() -> None:
+    """Wait until all output queued so far is written. Does nothing if the background writer is not running."""
+    writer = _background_writer
+    if writer is not None:
+        writer.flush()
+
+
+def stop_background_writer() -> None:
+    """Write all queued output and stop the background writer. Registered to run at exit."""
+    global _background_writer
+    with _background_writer_lock:
+        writer = _background_writer
+        _background_writer = None
+    if writer is None:
+        return
+    writer.close()
+    if writer.dropped:
+        print(
+            "crab_dbg: dropped %s records, output queue was full"
+            % format(writer.dropped, ","),
+            file=sys.stderr,
+        )
+
+
+def write_output(file: TextIO | None, text: str, flush: bool, options: Options) -> None:
+    """
+    Write the output of a dbg() call to file, directly or through the background writer.
+    Same as print(), file=None means sys.stdout, which is looked up now as it might have been replaced.
+    """
+    if file is None:
+        file = sys.stdout
+    if options.background:
+        # The writer may be replaced, because another thread changed the queue settings, and closed meanwhile. Then
+        # its replacement takes the record, unless it is replaced too, the record is then written right away.
+        for _ in range(2):
+            writer = get_background_writer(options.queue_size, options.overflow)
+            if writer.put(file, text, flush):
+                return
+    with WRITE_LOCK:
+        file.write(text)
+        if flush:
+            file.flush()
+
+
+def current_task_name() -> str | None:
+    """Get the name of the running asyncio task, if any."""
+    # If asyncio is not imported, there can't be any task. Don't pay for importing it.
+    asyncio = sys.modules.get("asyncio")
+    if asyncio is None:
+        return None
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        # No running event loop.
+        return None
+    return None if task is None else task.get_name()
+
+
+def get_context_tags(options: Options) -> str:
+    """
+    Get the tags telling who is calling dbg() and when, like " [thread=MainThread task=Task-1 t=12.345678]", or an
+    empty string if none is enabled.
+    """
+    tags = []
+    if options.show_thread:
+        tags.append("thread=%s" % threading.current_thread().name)
+    if options.show_task:
+        task_name = current_task_name()
+        if task_name is not None:
+            tags.append("task=%s" % task_name)
+    if options.show_time:
+        tags.append("t=%.6f" % monotonic())
+    if not tags:
+        return ""
+    return " [%s]" % " ".join(tags)
@@ -0,0 +1,88 @@
+import atexit
+import sys
+import threading
+from time import monotonic
+
+
+class Sampler:
+    """
+    Decide which calls of one dbg() call site are printed, when sampling or rate limiting is enabled.
+    """
+
+    __slots__ = ("location", "calls", "suppressed", "window_start", "window_count")
+
+    def __init__(self, location: str):
+        self.location = location
+        self.calls = 0
+        self.suppressed = 0
+        self.window_start = 0.0
+        self.window_count = 0
+
+    def should_emit(
+        self,
+        sample_every: int | None,
+        sample_rate: float | None,
+        rate_limit: float | None,
+    ) -> bool:
+        """
+        sample_every: Emit only the 1st, (N+1)th, (2N+1)th... call.
+        sample_rate: Emit each call with this probability.
+        rate_limit: Emit at most this many calls per second.
+        """
+        self.calls += 1
+        if (
+            (sample_every is not None and (self.calls - 1) % sample_every)
+            or (sample_rate is not None and _random() >= sample_rate)
+            or (rate_limit is not None and not self._within_rate_limit(rate_limit))
+        ):
+            if not self.suppressed:
+                _register_for_summary(self)
+            self.suppressed += 1
+            return False
+        return True
+
+    def _within_rate_limit(self, rate_limit: float) -> bool:
+        now = monotonic()
+        if now - self.window_start >= 1.0:
+            self.window_start = now
+            self.window_count = 0
+        if self.window_count >= rate_limit:
+            return False
+        self.window_count += 1
+        return True
+
+
+def _random() -> float:
+    # Import lazily, few users ever need this.
+    global _random
+    from random import random as _random
+
+    return _random()
+
+
+# Call sites which have suppressed some calls, to be reported at exit.
+_SUPPRESSING_SAMPLERS: list[Sampler] = []
+_SUPPRESSING_SAMPLERS_LOCK = threading.Lock()
+
+
+def _register_for_summary(sampler: Sampler) -> None:
+    with _SUPPRESSING_SAMPLERS_LOCK:
+        if not _SUPPRESSING_SAMPLERS:
+            atexit.register(_print_summary)
+        _SUPPRESSING_SAMPLERS.append(sampler)
+
+
+def _print_summary() -> None:
+    """
+    Tell how many calls each call site has suppressed, so nobody wonders where the missing output went.
+    """
+    for sampler in _SUPPRESSING_SAMPLERS:
+        print(
+            "crab_dbg: %s suppressed %s of %s calls"
+            % (
+                sampler.location,
+                format(sampler.suppressed, ","),
+                format(sampler.calls, ","),
+            ),
+            file=sys.stderr,
+        )
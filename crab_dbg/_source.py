@@ -0,0 +1,203 @@
+from ast import parse, unparse
+from collections import OrderedDict, namedtuple
+import dis
+import inspect
+from itertools import islice
+import linecache
+import os
+import threading
+from time import monotonic
+import tokenize
+from types import FrameType
+
+
+SourceCacheInfo = namedtuple(
+    "SourceCacheInfo", ["hits", "misses", "maxsize", "currsize"]
+)
+
+
+class _SourceCache:
+    """
+    Process wide cache of source files, shared by all dbg() call sites.
+
+    Files are kept in a LRU whose total size (in bytes, as reported by stat) is bounded by maxsize. An entry is only
+    reused if the file's mtime and size did not change since it was read.
+
+    Call sites check if their file was modified through stat(), which asks the OS at most once per STAT_INTERVAL
+    seconds for each file, instead of on every dbg() call.
+    """
+
+    STAT_INTERVAL = 1.0
+    # Most files whose stat is remembered, more only come from dynamically generated code.
+    STATS_MAX_SIZE = 4096
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.currsize = 0
+        self.hits = 0
+        self.misses = 0
+        # filename -> ((mtime, size), lines)
+        self._files: OrderedDict[str, tuple[tuple[int, int], list[str]]] = OrderedDict()
+        # filename -> (when, (mtime, size) or None)
+        self._stats: dict[str, tuple[float, tuple[int, int] | None]] = {}
+        self._lock = threading.Lock()
+
+    def stat(
+        self, filename: str, max_age: float = STAT_INTERVAL
+    ) -> tuple[int, int] | None:
+        """
+        Get the (mtime, size) pair of the named file, as stat_source(), unless it was asked for less than max_age
+        seconds ago.
+        """
+        now = monotonic()
+        entry = self._stats.get(filename)
+        if entry is not None and now - entry[0] < max_age:
+            return entry[1]
+        source_stat = stat_source(filename)
+        if len(self._stats) >= self.STATS_MAX_SIZE:
+            self._stats.clear()
+        self._stats[filename] = (now, source_stat)
+        return source_stat
+
+    def get_lines(self, filename: str, frame: FrameType) -> list[str] | None:
+        """
+        Get the source lines of the named file, which is the source file of this frame.
+        """
+        source_stat = self.stat(filename, 0)
+        if source_stat is None:
+            # Not a real file, e.g. a module imported from a zip file, or code registered by an interactive shell.
+            # linecache knows how to deal with them.
+            with self._lock:
+                self.misses += 1
+            return linecache.getlines(filename, frame.f_globals) or None
+
+        with self._lock:
+            entry = self._files.get(filename)
+            if entry is not None and entry[0] == source_stat:
+                self._files.move_to_end(filename)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        try:
+            with tokenize.open(filename) as f:
+                lines = f.readlines()
+        except (OSError, SyntaxError, UnicodeDecodeError):
+            return linecache.getlines(filename, frame.f_globals) or None
+
+        with self._lock:
+            self._evict(filename)
+            size = source_stat[1]
+            if size <= self.maxsize:
+                while self.currsize + size > self.maxsize:
+                    self._evict(next(iter(self._files)))
+                self._files[filename] = (source_stat, lines)
+                self.currsize += size
+        return lines
+
+    def _evict(self, filename: str) -> None:
+        entry = self._files.pop(filename, None)
+        if entry is not None:
+            self.currsize -= entry[0][1]
+
+    def cache_info(self) -> SourceCacheInfo:
+        with self._lock:
+            return SourceCacheInfo(self.hits, self.misses, self.maxsize, self.currsize)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._files.clear()
+            self._stats.clear()
+            self.currsize = 0
+            self.hits = 0
+            self.misses = 0
+
+
+# 32 MiB of source code is more than most code bases have.
+_SOURCE_CACHE = _SourceCache(maxsize=32 * 1024 * 1024)
+
+
+def source_cache_info() -> SourceCacheInfo:
+    """
+    Report hits, misses, maximum size and current size (both in bytes) of crab_dbg's source file cache.
+    """
+    return _SOURCE_CACHE.cache_info()
+
+
+def clear_source_cache() -> None:
+    """
+    Drop all cached source files and reset the hit and miss counters.
+    """
+    _SOURCE_CACHE.clear()
+
+
+def stat_source(filename: str) -> tuple[int, int] | None:
+    """
+    Get the (mtime, size) pair of a source file, used to tell if it has been modified since we last read it.
+    """
+    try:
+        st = os.stat(filename)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def get_source_stat(filename: str, fresh: bool = False) -> tuple[int, int] | None:
+    """
+    Get the (mtime, size) pair of a source file through the source cache, which calls stat at most once a second for
+    each file, unless fresh is True.
+    """
+    return _SOURCE_CACHE.stat(filename, 0 if fresh else _SourceCache.STAT_INTERVAL)
+
+
+def get_source_lines(frame: FrameType, filename: str) -> list[str] | None:
+    """
+    Get the source code of this frame as a list of lines.
+    We try to read the named file first, if failed, then fall back to linecache to handle the cases where source code
+    file is not available.
+    """
+    return _SOURCE_CACHE.get_lines(filename, frame)
+
+
+def get_frame_positions(frame: FrameType) -> dis.Positions:
+    """
+    Get the source positions of the instruction being executed in this frame, i.e. the dbg() call.
+
+    This reads the code object's position table directly, instead of going through inspect.getframeinfo(), which also
+    reads context lines from linecache and builds a Traceback object for us to throw away.
+    """
+    # Every instruction is one code unit of 2 bytes, and there is one positions entry per code unit.
+    positions = next(
+        islice(frame.f_code.co_positions(), frame.f_lasti // 2, None), None
+    )
+    if positions is not None and positions[0] is not None:
+        return dis.Positions(*positions)
+
+    # Positions are not available, e.g. python is run with -X no_debug_ranges.
+    return inspect.getframeinfo(frame).positions
+
+
+def get_dbg_raw_args(source_lines: list[str], positions: dis.Positions) -> list[str]:
+    """
+    Get the arguments to dbg() function as a list of strings. Does not include keyword arguments.
+    """
+    dbg_call_lines: list[str] = [
+        line.rstrip("\r\n")
+        for line in source_lines[positions.lineno - 1 : positions.end_lineno]
+    ]
+
+    if positions.col_offset is None or positions.end_col_offset is None:
+        # No column info, the dbg call is assumed to be the first statement on its lines.
+        dbg_call: str = "\n".join(line.strip() for line in dbg_call_lines)
+        dbg_call_args = parse(dbg_call).body[0].value.args
+        return [unparse(arg) for arg in dbg_call_args]
+
+    # Cut out exactly the dbg(...) call, so things like `print(dbg(a))` or `dbg(a); dbg(b)` work as well.
+    # Note that column offsets are utf-8 byte offsets.
+    dbg_call_lines[-1] = (
+        dbg_call_lines[-1].encode()[: positions.end_col_offset].decode()
+    )
+    dbg_call_lines[0] = dbg_call_lines[0].encode()[positions.col_offset :].decode()
+    dbg_call: str = "\n".join(dbg_call_lines)
+    dbg_call_args = parse(dbg_call, mode="eval").body.args
+    return [unparse(arg) for arg in dbg_call_args]
@@ -0,0 +1,270 @@
+"""
+Timing of code blocks and function calls, see dbg.span() and dbg.trace().
+"""
+
+from contextvars import ContextVar
+from functools import wraps
+import inspect
+from os import path
+import sys
+from time import perf_counter_ns, thread_time_ns
+from types import CodeType, FrameType
+from typing import Any, Callable, TextIO
+
+from ._config import config
+from ._format import render_human_readable_repr
+from ._json import format_json_span
+from ._output import get_context_tags, write_output
+from ._source import get_frame_positions
+from ._stats import format_ns
+
+# Labels of the spans and traced calls running, outermost first. Every thread and asyncio task has its own.
+_SPAN_PATH: ContextVar[tuple[str, ...]] = ContextVar("crab_dbg_span_path", default=())
+
+# (id of the code, offset of the CALL instruction) -> (code, (relative path, line, column)) of span() and trace()
+# calls. The code is kept alive so its id is not reused, hashing it would cost as much as its bytecode is long.
+_LOCATIONS: dict[tuple[int, int], tuple[CodeType, tuple[str, int, int]]] = {}
+_LOCATIONS_MAX_SIZE = 4096
+
+
+def _get_location(frame: FrameType) -> tuple[str, int, int]:
+    """Get where the call made in this frame is, like a dbg() call site, but without reading its source code."""
+    code = frame.f_code
+    key = (id(code), frame.f_lasti)
+    entry = _LOCATIONS.get(key)
+    if entry is None:
+        positions = get_frame_positions(frame)
+        location = (
+            path.relpath(code.co_filename),
+            positions.lineno,
+            (positions.col_offset or 0) + 1,
+        )
+        if len(_LOCATIONS) >= _LOCATIONS_MAX_SIZE:
+            _LOCATIONS.clear()
+        _LOCATIONS[key] = (code, location)
+        return location
+    return entry[1]
+
+
+def _emit(
+    location: tuple[str, int, int],
+    labels: tuple[str, ...],
+    text: str,
+    wall_ns: int,
+    cpu_ns: int,
+    file: TextIO | None,
+    flush: bool,
+) -> None:
+    """Write the timing of a span or a call, nested in the spans and calls named by `labels`."""
+    options = config
+    if options.output_format == "json":
+        output = format_json_span(location, labels, text, wall_ns, cpu_ns)
+    else:
+        # [<file_rel_path>:<line_no>:<col_no>] <outer label> > <label> took <wall>, cpu <cpu>
+        output = "[%s:%s:%s]%s %s%s took %s, cpu %s\n" % (
+            location[0],
+            location[1],
+            location[2],
+            get_context_tags(options),
+            "".join("%s > " % label for label in labels),
+            text,
+            format_ns(wall_ns),
+            format_ns(cpu_ns),
+        )
+    write_output(file, output, flush, options)
+
+
+class _Span:
+    """A block of code being timed, see span()."""
+
+    __slots__ = (
+        "label",
+        "location",
+        "file",
+        "flush",
+        "token",
+        "wall_started",
+        "cpu_started",
+    )
+
+    def __init__(
+        self,
+        label: str,
+        location: tuple[str, int, int] | None,
+        file: TextIO | None,
+        flush: bool,
+    ):
+        self.label = label
+        # None if dbg() is disabled.
+        self.location = location
+        self.file = file
+        self.flush = flush
+
+    def __enter__(self) -> "_Span":
+        if self.location is not None:
+            self.token = _SPAN_PATH.set(_SPAN_PATH.get() + (self.label,))
+            self.cpu_started = thread_time_ns()
+            self.wall_started = perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if self.location is None:
+            return
+        wall_ns = perf_counter_ns() - self.wall_started
+        cpu_ns = thread_time_ns() - self.cpu_started
+        _SPAN_PATH.reset(self.token)
+        text = self.label
+        if exc_type is not None:
+            text = "%s raised %s" % (text, exc_type.__name__)
+        _emit(
+            self.location,
+            _SPAN_PATH.get(),
+            text,
+            wall_ns,
+            cpu_ns,
+            self.file,
+            self.flush,
+        )
+
+
+# What span() returns when dbg() is disabled, it does nothing.
+_DISABLED_SPAN = _Span("", None, None, False)
+
+
+def span(label: str, *, file: TextIO | None = None, flush: bool = False) -> _Span:
+    """
+    Time a block of code, and print how long it took when it is done:
+
+        with dbg.span("load"):
+            rows = load()
+
+    prints `[main.py:1:6] load took 12.345 ms, cpu 11.002 ms`, i.e. wall clock time, and CPU time of the calling thread,
+    so other threads working meanwhile don't count. Spans and traced calls nested in others are prefixed by their
+    labels, like `load > parse took ...`.
+
+    Args:
+        label: Names the block in the output.
+        file: File to write to (default is sys.stdout, same as dbg()).
+        flush: Whether to flush the output.
+    """
+    if not config.enabled:
+        return _DISABLED_SPAN
+    return _Span("%s" % (label,), _get_location(sys._getframe(1)), file, flush)
+
+
+def _render_call(name: str, args: tuple, kwargs: dict) -> list[str]:
+    """Render a call like `name(1, [2], key='value')`, with each argument rendered like by dbg()."""
+    fragments = [name, "("]
+    append = fragments.append
+    for arg in args:
+        if len(fragments) > 2:
+            append(", ")
+        render_human_readable_repr(arg, append, config)
+    for key, value in kwargs.items():
+        if len(fragments) > 2:
+            append(", ")
+        append(key)
+        append("=")
+        render_human_readable_repr(value, append, config)
+    append(")")
+    return fragments
+
+
+class _CallTimer:
+    """One call of a traced function being timed."""
+
+    __slots__ = ("labels", "fragments", "token", "wall_started", "cpu_started")
+
+    def __init__(self, name: str, args: tuple, kwargs: dict):
+        # Arguments are rendered before the call, which may modify them, and isn't timed.
+        self.fragments = _render_call(name, args, kwargs)
+        self.labels = _SPAN_PATH.get()
+        self.token = _SPAN_PATH.set(self.labels + (name,))
+        self.cpu_started = thread_time_ns()
+        self.wall_started = perf_counter_ns()
+
+    def finish(
+        self,
+        location: tuple[str, int, int],
+        result: Any,
+        error: BaseException | None,
+        file: TextIO | None,
+        flush: bool,
+    ) -> None:
+        wall_ns = perf_counter_ns() - self.wall_started
+        cpu_ns = thread_time_ns() - self.cpu_started
+        _SPAN_PATH.reset(self.token)
+        fragments = self.fragments
+        if error is None:
+            fragments.append(" = ")
+            render_human_readable_repr(result, fragments.append, config)
+        else:
+            fragments.append(" raised %s" % type(error).__name__)
+        _emit(location, self.labels, "".join(fragments), wall_ns, cpu_ns, file, flush)
+
+
+def _trace(
+    func: Callable,
+    location: tuple[str, int, int],
+    file: TextIO | None,
+    flush: bool,
+) -> Callable:
+    name = func.__qualname__
+
+    if inspect.iscoroutinefunction(func):
+
+        @wraps(func)
+        async def traced_coroutine(*args, **kwargs):
+            if not config.enabled:
+                return await func(*args, **kwargs)
+            timer = _CallTimer(name, args, kwargs)
+            try:
+                result = await func(*args, **kwargs)
+            except BaseException as error:
+                timer.finish(location, None, error, file, flush)
+                raise
+            timer.finish(location, result, None, file, flush)
+            return result
+
+        return traced_coroutine
+
+    @wraps(func)
+    def traced(*args, **kwargs):
+        if not config.enabled:
+            return func(*args, **kwargs)
+        timer = _CallTimer(name, args, kwargs)
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as error:
+            timer.finish(location, None, error, file, flush)
+            raise
+        timer.finish(location, result, None, file, flush)
+        return result
+
+    return traced
+
+
+def trace(
+    func: Callable | None = None,
+    *,
+    file: TextIO | None = None,
+    flush: bool = False,
+):
+    """
+    Print the arguments, return value and duration of every call of a function:
+
+        @dbg.trace
+        def area(width, height):
+            return width * height
+
+    prints `[main.py:1:2] area(2, 3) = 6 took 1.250 us, cpu 1.143 us` for `area(2, 3)`. Arguments and return values
+    are rendered like by dbg(), before and after the call, outside of the time measured. Coroutine functions are
+    timed until their coroutine is done, their CPU time then includes other tasks run by the thread while they await.
+    Calls nested in spans or other traced calls are prefixed by their labels.
+
+    Also takes the same `file` and `flush` arguments as span(), as `@dbg.trace(file=sys.stderr)`.
+    """
+    location = _get_location(sys._getframe(1))
+    if func is None:
+        return lambda func: _trace(func, location, file, flush)
+    return _trace(func, location, file, flush)
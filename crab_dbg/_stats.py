@@ -0,0 +1,156 @@
+"""
+How much time dbg() itself takes, per call site and stage, see the profile option.
+"""
+
+import atexit
+from collections import namedtuple
+import sys
+import threading
+from time import perf_counter_ns
+
+# Timings of one stage of the dbg() calls of a call site. `histogram` holds (upper bound, count) pairs of the
+# non-empty power of two buckets, i.e. (1024, 3) means 3 calls took 512 to 1023 ns.
+StageStats = namedtuple("StageStats", ["count", "total_ns", "max_ns", "histogram"])
+
+# Timings of the dbg() calls of a call site, `stages` maps stage names, see STAGES, to their StageStats.
+CallSiteStats = namedtuple("CallSiteStats", ["location", "calls", "total_ns", "stages"])
+
+# Stages of a dbg() call:
+# source: finding the call site, reading its source code the first time
+# parse: parsing the source code of the arguments, only the first time
+# render: turning the arguments into text, or records. With stream=True, writing is included.
+# write: writing the output, or handing it to the background writer.
+STAGES = ("source", "parse", "render", "write")
+SOURCE = 0
+PARSE = 1
+RENDER = 2
+WRITE = 3
+
+# Durations are counted in buckets by their bit length, the last one takes everything longer.
+_BUCKETS = 48
+
+
+class SiteProfile:
+    """
+    Timings of one dbg() call site. Updated without a lock, like Sampler, so counts may be slightly off when several
+    threads call the same call site at once.
+    """
+
+    __slots__ = ("location", "calls", "counts", "totals", "maxima", "buckets")
+
+    def __init__(self, location: str):
+        self.location = location
+        self.reset()
+
+    def reset(self) -> None:
+        self.calls = 0
+        self.counts = [0] * len(STAGES)
+        self.totals = [0] * len(STAGES)
+        self.maxima = [0] * len(STAGES)
+        self.buckets = [[0] * _BUCKETS for _ in STAGES]
+
+    def add(self, stage: int, duration: int) -> None:
+        self.counts[stage] += 1
+        self.totals[stage] += duration
+        if duration > self.maxima[stage]:
+            self.maxima[stage] = duration
+        self.buckets[stage][min(duration.bit_length(), _BUCKETS - 1)] += 1
+
+    def start_call(self, started: int, parse_ns: int) -> int:
+        """
+        Count a call, whose call site was found in the time since `started`, `parse_ns` of which were spent parsing
+        its source code. Returns the current time, where the next stage starts.
+        """
+        now = perf_counter_ns()
+        self.calls += 1
+        if parse_ns:
+            self.add(PARSE, parse_ns)
+        self.add(SOURCE, now - started - parse_ns)
+        return now
+
+    def lap(self, stage: int, started: int) -> int:
+        """Count the time since `started` to a stage, and return the current time, where the next stage starts."""
+        now = perf_counter_ns()
+        self.add(stage, now - started)
+        return now
+
+    def snapshot(self) -> CallSiteStats:
+        stages = {}
+        for stage, name in enumerate(STAGES):
+            histogram = tuple(
+                (1 << bucket, count)
+                for bucket, count in enumerate(self.buckets[stage])
+                if count
+            )
+            stages[name] = StageStats(
+                self.counts[stage], self.totals[stage], self.maxima[stage], histogram
+            )
+        return CallSiteStats(self.location, self.calls, sum(self.totals), stages)
+
+
+# location -> profile, of all call sites profiled so far.
+_PROFILES: dict[str, SiteProfile] = {}
+_PROFILES_LOCK = threading.Lock()
+
+
+def get_profile(location: str) -> SiteProfile:
+    """Get the profile of a call site, which is kept even if the call site is evicted from the call site cache."""
+    profile = _PROFILES.get(location)
+    if profile is None:
+        with _PROFILES_LOCK:
+            profile = _PROFILES.get(location)
+            if profile is None:
+                if not _PROFILES:
+                    atexit.register(_print_report)
+                profile = _PROFILES[location] = SiteProfile(location)
+    return profile
+
+
+def stats() -> list[CallSiteStats]:
+    """
+    Report how much time dbg() took at each call site, slowest first, if the profile option is on. For example:
+
+        configure(profile=True)
+        ...
+        for site in stats():
+            print(site.location, site.calls, site.total_ns, site.stages["render"].max_ns)
+    """
+    with _PROFILES_LOCK:
+        profiles = list(_PROFILES.values())
+    snapshots = [profile.snapshot() for profile in profiles]
+    snapshots.sort(key=lambda snapshot: snapshot.total_ns, reverse=True)
+    return snapshots
+
+
+def reset_stats() -> None:
+    """Forget the timings collected so far."""
+    with _PROFILES_LOCK:
+        for profile in _PROFILES.values():
+            profile.reset()
+
+
+def format_ns(duration: int) -> str:
+    if duration >= 1000000:
+        return "%.3f ms" % (duration / 1e6)
+    return "%.3f us" % (duration / 1e3)
+
+
+def _print_report() -> None:
+    """Tell how much time dbg() took at each call site, slowest first."""
+    for snapshot in stats():
+        if not snapshot.calls:
+            continue
+        print(
+            "crab_dbg: %s %s calls took %s, %s"
+            % (
+                snapshot.location,
+                format(snapshot.calls, ","),
+                format_ns(snapshot.total_ns),
+                ", ".join(
+                    "%s %s" % (name, format_ns(stage.total_ns))
+                    for name, stage in snapshot.stages.items()
+                    if stage.count
+                ),
+            ),
+            file=sys.stderr,
+        )
@@ -0,0 +1,48 @@
+from itertools import islice
+
+
+class Watcher:
+    """
+    Remember what the arguments of one dbg() call site looked like last time, see the changed_only option.
+
+    Only a digest of each rendering is kept, unless diffs are wanted, which need the previous text.
+    """
+
+    __slots__ = ("digests", "texts")
+
+    def __init__(self):
+        self.digests: list[int] | None = None
+        self.texts: list[str] | None = None
+
+    def changes(self, texts: list[str], diff: bool) -> list[tuple[str, bool] | None]:
+        """
+        Compare the renderings of the arguments of a call to those of the previous call. For each argument, returns
+        None if it is unchanged, otherwise what to print and whether that is a diff against its previous rendering.
+        """
+        digests = [hash(text) for text in texts]
+        previous_digests = self.digests
+        previous_texts = self.texts
+        self.digests = digests
+        self.texts = texts if diff else None
+
+        if previous_digests is None:
+            return [(text, False) for text in texts]
+        changes: list[tuple[str, bool] | None] = []
+        for i, text in enumerate(texts):
+            if digests[i] == previous_digests[i]:
+                changes.append(None)
+            elif previous_texts is not None:
+                changes.append((_diff(previous_texts[i], text), True))
+            else:
+                changes.append((text, False))
+        return changes
+
+
+def _diff(old: str, new: str) -> str:
+    """Get the lines that differ between two renderings, with a line of context, in unified diff format."""
+    # Import lazily, few users ever need this.
+    import difflib
+
+    lines = difflib.unified_diff(old.splitlines(), new.splitlines(), lineterm="", n=1)
+    # Skip the "---" and "+++" file names.
+    return "\n".join(islice(lines, 2, None))
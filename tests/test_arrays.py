@@ -0,0 +1,208 @@
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+
+from crab_dbg._arrays import array_library
+from crab_dbg._config import Options
+from crab_dbg._format import get_human_readable_repr
+
+
+def _summary(obj) -> str:
+    return get_human_readable_repr(obj, Options().override(array_summary=True))
+
+
+class _Dtype:
+    def __init__(self, name: str, kind: str):
+        self.name = name
+        self.kind = kind
+
+    def __str__(self):
+        return self.name
+
+
+class FakeSeries:
+    """Just enough of pandas.Series, pandas is not a dependency."""
+
+    def __init__(self, name, values):
+        self.name = name
+        self.values = values
+        self.dtype = _Dtype("float64", "f")
+
+    def __len__(self):
+        return len(self.values)
+
+    def __repr__(self):
+        raise AssertionError("repr() should not be called in summary mode")
+
+    def memory_usage(self, index, deep):
+        return 8 * len(self.values) + 128
+
+    def min(self):
+        return min(v for v in self.values if v == v)
+
+    def max(self):
+        return max(v for v in self.values if v == v)
+
+    def mean(self):
+        values = [v for v in self.values if v == v]
+        return sum(values) / len(values)
+
+    def isna(self):
+        return np.array([v != v for v in self.values])
+
+
+FakeSeries.__module__ = "pandas.core.series"
+FakeSeries.__name__ = FakeSeries.__qualname__ = "Series"
+
+
+class _Device:
+    def __init__(self, device: str):
+        self.type = device.split(":")[0]
+        self.device = device
+
+    def __str__(self):
+        return self.device
+
+
+class FakeTensor:
+    """Just enough of torch.Tensor, backed by a numpy array, so tensors can be tested without pytorch or a GPU."""
+
+    def __init__(self, data, device="cpu", requires_grad=False):
+        self.data = np.asarray(data)
+        self.device = _Device(device)
+        self.requires_grad = requires_grad
+        self.layout = "torch.strided"
+
+    def _check_device(self):
+        if self.device.type != "cpu":
+            raise AssertionError("data of a %s tensor should not be read" % self.device)
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    @property
+    def dtype(self):
+        return "torch.%s" % self.data.dtype
+
+    def stride(self):
+        return tuple(s // self.data.itemsize for s in self.data.strides)
+
+    def element_size(self):
+        return self.data.itemsize
+
+    def nelement(self):
+        return self.data.size
+
+    def is_complex(self):
+        return self.data.dtype.kind == "c"
+
+    def is_floating_point(self):
+        return self.data.dtype.kind == "f"
+
+    def detach(self):
+        self._check_device()
+        return FakeTensor(self.data, str(self.device))
+
+    def isnan(self):
+        return np.isnan(self.data)
+
+    def __getitem__(self, mask):
+        return FakeTensor(self.data[mask], str(self.device))
+
+    def min(self):
+        return self.data.min()
+
+    def max(self):
+        return self.data.max()
+
+    def mean(self, dtype=None):
+        return self.data.mean(dtype=dtype)
+
+    def __repr__(self):
+        self._check_device()
+        return "tensor(%s)" % np.array2string(self.data, separator=", ")
+
+
+FakeTensor.__module__ = "torch"
+FakeTensor.__name__ = FakeTensor.__qualname__ = "Tensor"
+
+
+class Parameter(FakeTensor):
+    pass
+
+
+Parameter.__module__ = "torch.nn.parameter"
+
+
+def test_array_library():
+    assert array_library(np.ndarray) == "numpy"
+    assert array_library(FakeTensor) == "torch"
+    assert array_library(Parameter) == "torch"
+    assert array_library(FakeSeries) == "pandas.Series"
+    assert array_library(list) is None
+
+
+def test_numpy_summary():
+    assert _summary(np.arange(6).reshape(2, 3)) == (
+        "ndarray(shape=(2, 3), dtype=int64, nbytes=48 B, min=0, max=5, mean=2.5)"
+    )
+    assert _summary(np.array([1.0, np.nan, 3.0])) == (
+        "ndarray(shape=(3,), dtype=float64, nbytes=24 B, min=1, max=3, mean=2, nan=1)"
+    )
+    assert _summary(np.array([np.nan])) == (
+        "ndarray(shape=(1,), dtype=float64, nbytes=8 B, nan=1)"
+    )
+    assert _summary(np.array([], dtype=np.float32)) == (
+        "ndarray(shape=(0,), dtype=float32, nbytes=0 B)"
+    )
+    assert _summary(np.array(["x"])) == "ndarray(shape=(1,), dtype=<U1, nbytes=4 B)"
+
+
+def test_numpy_summary_is_one_line_in_containers():
+    assert _summary({"weights": np.zeros((1024, 1024))}) == (
+        "{\n    weights: ndarray(shape=(1024, 1024), dtype=float64, nbytes=8.0 MiB, min=0, max=0, mean=0, nan=0)\n}"
+    )
+
+
+def test_summary_does_not_call_repr():
+    assert _summary(FakeSeries("price", [1.0, float("nan"), 2.0])) == (
+        "Series(name=price, length=3, dtype=float64, memory=152 B, min=1, max=2, mean=1.5, nan=1)"
+    )
+
+
+def test_summary_is_off_by_default():
+    assert get_human_readable_repr(np.array([1, 2])) == "\narray([1, 2])"
+
+
+def test_cpu_tensor(monkeypatch):
+    # The only attribute of the torch module used.
+    monkeypatch.setitem(sys.modules, "torch", SimpleNamespace(float64=np.float64))
+    tensor = FakeTensor(np.array([[1.0, 2.0], [3.0, float("nan")]]))
+    # Tensors on the CPU are read, just like numpy arrays.
+    assert get_human_readable_repr(tensor) == "\n" + repr(tensor)
+    assert _summary(tensor) == (
+        "Tensor(shape=(2, 2), dtype=torch.float64, device=cpu, requires_grad=False, stride=(2, 1), "
+        "nbytes=32 B, min=1, max=3, mean=2, nan=1)"
+    )
+
+
+def test_tensor_subclass_metadata_only():
+    parameter = Parameter(np.ones((3, 4), dtype=np.float32), requires_grad=True)
+    assert get_human_readable_repr(
+        [parameter], Options().override(tensor_data=False)
+    ) == (
+        "[\n    Parameter(shape=(3, 4), dtype=torch.float32, device=cpu, requires_grad=True, stride=(4, 1), "
+        "nbytes=48 B)\n]"
+    )
+
+
+def test_gpu_tensor_data_is_not_read():
+    tensor = FakeTensor(np.zeros(8, dtype=np.float16), device="cuda:0")
+    expected = (
+        "Tensor(shape=(8,), dtype=torch.float16, device=cuda:0, requires_grad=False, stride=(1,), "
+        "nbytes=16 B)"
+    )
+    assert get_human_readable_repr(tensor) == expected
+    assert _summary(tensor) == expected
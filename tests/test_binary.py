@@ -0,0 +1,193 @@
+from collections import deque
+import io
+import sys
+
+import numpy as np
+import pytest
+
+from crab_dbg import configure, dbg, register, unregister
+from crab_dbg.__main__ import main
+from crab_dbg._binary import (
+    MAGIC,
+    format_binary_record,
+    iter_records,
+    render_records,
+)
+from crab_dbg._config import Options
+from crab_dbg._format import get_human_readable_repr
+from crab_dbg._iterables import preview_iterators
+
+
+class Node:
+    def __init__(self, val, next=None):
+        self.val = val
+        self.next = next
+
+
+class Config:
+    version = 2
+
+    def __init__(self):
+        self.name = "prod"
+        self.tags = {"a", "b"}
+
+
+def _round_trip(obj, options: Options) -> str:
+    record = format_binary_record("[main.py:1:1]", ["x"], (obj,), options)
+    ((location, render_options, args),) = iter_records(MAGIC + record)
+    assert location == "[main.py:1:1]"
+    assert args[0][0] == "x"
+    return get_human_readable_repr(args[0][1], render_options)
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        Options(),
+        Options().override(max_items=2),
+        Options().override(max_depth=1),
+        Options().override(max_string=3),
+        Options().override(array_summary=True),
+        Options().override(dedup=True),
+        Options().override(dedup=True, max_depth=2, max_items=2),
+        Options().override(preview_items=2),
+        Options().override(hexdump=20, checksum=True),
+    ],
+)
+def test_round_trip_renders_same_text(options):
+    cyclic = [1, 2]
+    cyclic.append(cyclic)
+    cyclic_dict = {"k": None}
+    cyclic_dict["self"] = cyclic_dict
+    shared = {"shared": [1, 2, 3]}
+    values = [
+        [shared, [shared, (shared,)], {"again": shared}],
+        [[shared], shared, shared],
+        None,
+        True,
+        -(10**30),
+        1.5,
+        float("nan"),
+        1j,
+        "line\nbreak",
+        b"\x00bytes",
+        [1, [2, [3, [4]]], (5, 6)],
+        (),
+        {1: "one", (2, 3): [4, 5, 6]},
+        Node(0, Node(1, Node(2))),
+        Config(),
+        cyclic,
+        cyclic_dict,
+        np.arange(6).reshape(2, 3),
+        {"arrays": [np.zeros(3)]},
+        list(range(100)),
+        deque([shared, shared]),
+        [bytearray(b"buffer"), memoryview(b"view")],
+        {"a": deque(range(10))}.items(),
+        # Beyond the strings referred to in one byte, and ints of several bytes.
+        ["s%d" % (i % 100) for i in range(300)],
+        {"k%d" % (i % 80): [Node(i)] for i in range(200)},
+        list(range(-20000, 20000, 97)),
+    ]
+    for value in values:
+        assert _round_trip(value, options) == get_human_readable_repr(value, options)
+
+
+def test_iterator_preview_round_trip():
+    options = Options().override(preview_items=3)
+    for args in ((i for i in range(10)), iter("ab")):
+        rendered_args, _ = preview_iterators((args,), 3)
+        assert _round_trip(rendered_args[0], options) == get_human_readable_repr(
+            rendered_args[0], options
+        )
+
+
+def test_registered_formatter_of_plain_type_is_recorded():
+    register(int, lambda number: "#%d" % number)
+    try:
+        assert (
+            _round_trip([1, {"a": 2}], Options())
+            == "[\n    #1,\n    {\n        a: #2\n    }\n]"
+        )
+    finally:
+        unregister(int)
+
+
+def test_dedup_across_arguments_round_trip():
+    cfg = {"a": [1]}
+    options = Options().override(dedup=True)
+    record = format_binary_record(
+        "[main.py:1:1]", ["cfg", "[cfg]"], (cfg, [cfg]), options
+    )
+    file = io.StringIO()
+    render_records(MAGIC + record, file.write)
+    assert file.getvalue() == (
+        "[main.py:1:1] cfg = &1 {\n    a: [\n        1\n    ]\n}\n[main.py:1:1] [cfg] = [\n    *1\n]\n"
+    )
+
+
+def test_deeply_nested_round_trip():
+    head = None
+    # Deeper than the recursion limit.
+    for i in range(1500):
+        head = Node(i, head)
+    assert _round_trip(head, Options()) == get_human_readable_repr(head)
+
+
+def test_binary_output_and_render_command(tmp_path):
+    record_path = str(tmp_path / "dbg.records")
+    pi = 3.14
+    configure(output_format="binary", record_path=record_path)
+    try:
+        dbg(pi, [1, 2], flush=True)
+        dbg(flush=True)
+    finally:
+        configure(output_format="text")
+
+    stdout = io.StringIO()
+    sys.stdout = stdout
+    try:
+        assert main(["render", record_path]) == 0
+    finally:
+        sys.stdout = sys.__stdout__
+
+    lines = stdout.getvalue().splitlines()
+    assert lines[0].startswith("[tests/test_binary.py:")
+    assert lines[0].endswith("] pi = 3.14")
+    assert lines[1].endswith("] [1, 2] = [")
+    assert lines[2:4] == ["    1,", "    2"]
+    assert lines[4] == "]"
+    assert lines[5].endswith("]") and " = " not in lines[5]
+
+
+def test_render_command_rejects_other_files(tmp_path):
+    path = tmp_path / "not_records.txt"
+    path.write_text("hello")
+    stderr = io.StringIO()
+    sys.stderr = stderr
+    try:
+        assert main(["render", str(path)]) == 1
+    finally:
+        sys.stderr = sys.__stderr__
+    assert "Not a crab_dbg record file" in stderr.getvalue()
+
+
+def test_render_command_rejects_missing_and_truncated_files(tmp_path):
+    path = tmp_path / "crab_dbg.records"
+    record = format_binary_record("[x]", ["v"], ([1.5, "a", {"k": None}],), Options())
+    # Whole records, whose values are cut short.
+    assert record[0] < 0x80
+    path.write_bytes(MAGIC + bytes([record[0] - 3]) + record[1:-3])
+    stderr = io.StringIO()
+    sys.stderr = stderr
+    sys.stdout = io.StringIO()
+    try:
+        assert main(["render", str(path)]) == 1
+        assert main(["render", str(tmp_path / "missing.records")]) == 1
+    finally:
+        sys.stderr = sys.__stderr__
+        sys.stdout = sys.__stdout__
+    assert stderr.getvalue().splitlines() == [
+        "crab_dbg: %s: truncated or corrupt records" % path,
+        "crab_dbg: %s: No such file or directory" % (tmp_path / "missing.records"),
+    ]
@@ -0,0 +1,74 @@
+from binascii import crc32
+import io
+
+import numpy as np
+
+from crab_dbg import dbg
+from crab_dbg._config import Options
+from crab_dbg._format import get_human_readable_repr
+
+
+def _hexdump(value, size=64, checksum=False) -> str:
+    return get_human_readable_repr(
+        value, Options().override(hexdump=size, checksum=checksum)
+    )
+
+
+def test_hexdump():
+    assert _hexdump(b"Hello, world!\n\x00\xff and more") == (
+        "bytes(len=25) [\n"
+        "    00000000  48 65 6c 6c 6f 2c 20 77  6f 72 6c 64 21 0a 00 ff  |Hello, world!...|\n"
+        "    00000010  20 61 6e 64 20 6d 6f 72  65                       | and more|\n"
+        "]"
+    )
+    assert _hexdump([bytearray(b"ab")]) == (
+        "[\n"
+        "    bytearray(len=2) [\n"
+        "        00000000  61 62                                             |ab|\n"
+        "    ]\n"
+        "]"
+    )
+    assert _hexdump(b"") == "bytes(len=0) []"
+
+
+def test_hexdump_is_bounded():
+    payload = bytes(10**7)
+    assert _hexdump(payload, size=4, checksum=True) == (
+        "bytes(len=10,000,000, crc32=0x%08x) [\n"
+        "    00000000  00 00 00 00                                       |....|\n"
+        "    ... 9,999,996 more bytes\n"
+        "]" % crc32(payload)
+    )
+
+
+def test_hexdump_of_memoryview():
+    array = np.arange(6, dtype="<u2").reshape(2, 3)
+    assert _hexdump(memoryview(array), size=4) == (
+        "memoryview(len=12) [\n"
+        "    00000000  00 00 01 00                                       |....|\n"
+        "    ... 8 more bytes\n"
+        "]"
+    )
+    # Not contiguous, the bytes of the items are shown in order.
+    assert _hexdump(memoryview(array[:, ::2]), size=4) == (
+        "memoryview(len=8) [\n"
+        "    00000000  00 00 02 00                                       |....|\n"
+        "    ... 4 more bytes\n"
+        "]"
+    )
+
+
+def test_buffers_without_hexdump():
+    assert get_human_readable_repr([b"a\n", bytearray(b"b")]) == (
+        "[\n    b'a\\n',\n    bytearray(b'b')\n]"
+    )
+    # A memoryview is rendered by its repr(), however large its buffer is.
+    assert get_human_readable_repr(memoryview(bytes(4 * 1024 * 1024))).startswith(
+        "<memory at 0x"
+    )
+    file = io.StringIO()
+    dbg(memoryview(bytes(4 * 1024 * 1024)), file=file)
+    assert len(file.getvalue()) < 200
+    assert get_human_readable_repr(
+        memoryview(b"a"), Options().override(preview_items=2)
+    ) == ("memoryview [\n    97\n]")
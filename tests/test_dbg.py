@@ -1,9 +1,20 @@
+from collections import OrderedDict
+import importlib
+import inspect
 import io
+import json
+import os
+import subprocess
 import sys
 
 import numpy as np
+import pytest
 
-from crab_dbg import dbg
+import crab_dbg._dbg
+import crab_dbg._format
+import crab_dbg._sampling
+import crab_dbg._source
+from crab_dbg import configure, dbg, disable, enable, is_enabled
 
 
 def _redirect_stdout_stderr_to_buffer() -> tuple[io.StringIO, io.StringIO]:
@@ -634,3 +645,385 @@ Hack() = Hack {
 """
 
     _assert_correct(stdout.getvalue(), expected_outputs)
+
+
+def test_nested_in_other_call():
+    stdout, _ = _redirect_stdout_stderr_to_buffer()
+
+    pi = 3.14
+    str(dbg(pi))
+    _reset_stdout_stderr()
+
+    _assert_correct(stdout.getvalue(), "pi = 3.14")
+
+
+def test_call_site_cache(monkeypatch):
+    stdout, _ = _redirect_stdout_stderr_to_buffer()
+
+    calls = []
+    get_source_lines = crab_dbg._dbg.get_source_lines
+
+    def _counting_get_source_lines(*args):
+        calls.append(args)
+        return get_source_lines(*args)
+
+    monkeypatch.setattr(crab_dbg._dbg, "get_source_lines", _counting_get_source_lines)
+    for i in range(3):
+        dbg(i)
+    _reset_stdout_stderr()
+
+    _assert_correct(stdout.getvalue(), "i = 0\ni = 1\ni = 2")
+    assert len(calls) == 1
+
+
+def test_call_site_cache_evicts_least_recently_used(monkeypatch):
+    sink = io.StringIO()
+    calls = []
+    get_source_lines = crab_dbg._dbg.get_source_lines
+
+    def _counting_get_source_lines(*args):
+        calls.append(args)
+        return get_source_lines(*args)
+
+    monkeypatch.setattr(crab_dbg._dbg, "get_source_lines", _counting_get_source_lines)
+    monkeypatch.setattr(crab_dbg._dbg, "_CALL_SITES", OrderedDict())
+    monkeypatch.setattr(crab_dbg._dbg, "_CALL_SITES_MAX_SIZE", 2)
+
+    def _hot():
+        dbg(0, file=sink)
+
+    _hot()
+    dbg(1, file=sink)
+    _hot()
+    dbg(2, file=sink)
+    _hot()
+    dbg(3, file=sink)
+    _hot()
+
+    # Only the call sites in between are evicted, the one used all along is parsed once.
+    assert len(calls) == 4
+
+
+def test_call_site_cache_invalidated_on_source_change(tmp_path, monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(crab_dbg._source, "monotonic", lambda: now[0])
+    module_file = tmp_path / "dbg_call_site_module.py"
+    module_file.write_text("from crab_dbg import dbg\n\ndef f(a):\n    dbg(a)\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    module = importlib.import_module("dbg_call_site_module")
+
+    stdout, _ = _redirect_stdout_stderr_to_buffer()
+    module.f(1)
+    # Same layout, different argument text, as if the file is edited while the program is running.
+    module_file.write_text("from crab_dbg import dbg\n\ndef f(a):\n    dbg(b)\n")
+    mtime_ns = module_file.stat().st_mtime_ns + 10**9
+    os.utime(module_file, ns=(mtime_ns, mtime_ns))
+    module.f(2)
+    # The file is only checked again a second later.
+    now[0] += 1.0
+    module.f(3)
+    _reset_stdout_stderr()
+
+    outputs = stdout.getvalue().splitlines()
+    assert outputs[0].endswith("] a = 1")
+    assert outputs[1].endswith("] a = 2")
+    assert outputs[2].endswith("] b = 3")
+
+
+def test_call_site_kept_when_edited_source_does_not_fit(tmp_path, monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(crab_dbg._source, "monotonic", lambda: now[0])
+    module_file = tmp_path / "dbg_edited_module.py"
+    module_file.write_text(
+        "from crab_dbg import dbg\n\ndef f(a):\n    dbg(a)\n\ndef g(a, b):\n    dbg(a, b)\n"
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+    module = importlib.import_module("dbg_edited_module")
+
+    stdout, _ = _redirect_stdout_stderr_to_buffer()
+    module.f(1)
+    module.g(1, 2)
+    # A comment line moves every line down, the running code still has the old positions.
+    module_file.write_text(
+        "# Edited.\nfrom crab_dbg import dbg\n\ndef f(a):\n    dbg(a)\n\ndef g(a, b):\n    dbg(a, b)\n"
+    )
+    mtime_ns = module_file.stat().st_mtime_ns + 10**9
+    os.utime(module_file, ns=(mtime_ns, mtime_ns))
+    now[0] += 1.0
+    module.f(2)
+    module.g(3, 4)
+    _reset_stdout_stderr()
+
+    outputs = [line.split("] ", 1)[1] for line in stdout.getvalue().splitlines()]
+    assert outputs == ["a = 1", "a = 1", "b = 2", "a = 2", "a = 3", "b = 4"]
+
+
+def test_frame_positions_fast_path():
+    def _probe():
+        frame = sys._getframe(1)
+        return (
+            crab_dbg._source.get_frame_positions(frame),
+            inspect.getframeinfo(frame).positions,
+        )
+
+    fast_path_positions, inspect_positions = _probe()
+    assert fast_path_positions == inspect_positions
+
+
+def test_stream():
+    stdout, _ = _redirect_stdout_stderr_to_buffer()
+
+    stock_price = [100, 99, 101, 1]
+    ret = dbg(stock_price, stream=True)
+    _reset_stdout_stderr()
+
+    expected_outputs = """
+stock_price = [
+    100,
+    99,
+    101,
+    1
+]
+"""
+
+    _assert_correct(stdout.getvalue(), expected_outputs)
+    assert ret is stock_price
+
+
+def test_stream_in_chunks():
+    class ChunkRecorder(io.StringIO):
+        def __init__(self):
+            super().__init__()
+            self.chunks = []
+
+        def write(self, s):
+            self.chunks.append(s)
+            return super().write(s)
+
+    file = ChunkRecorder()
+    large_list = list(range(10000))
+    dbg(large_list, file=file, stream=True, chunk_size=1024)
+
+    output = file.getvalue()
+    assert output.endswith(
+        "] large_list = %s\n" % crab_dbg._format.get_human_readable_repr(large_list)
+    )
+    assert len(file.chunks) > 1
+    assert all(len(chunk) < 2 * 1024 for chunk in file.chunks)
+
+
+def test_limits():
+    stdout, _ = _redirect_stdout_stderr_to_buffer()
+
+    large_list = list(range(1000))
+    configure(max_items=2)
+    try:
+        dbg(large_list)
+        dbg(large_list, max_items=1)
+    finally:
+        configure(max_items=None)
+    _reset_stdout_stderr()
+
+    expected_outputs = """
+large_list = [
+    0,
+    1,
+    ... 998 more items
+]
+large_list = [
+    0,
+    ... 999 more items
+]
+"""
+
+    _assert_correct(stdout.getvalue(), expected_outputs)
+
+
+def test_configure_rejects_unknown_options():
+    with pytest.raises(TypeError):
+        configure(max_itmes=2)
+    with pytest.raises(ValueError):
+        configure(max_items=-1)
+
+
+def test_dedup_across_arguments():
+    stdout, _ = _redirect_stdout_stderr_to_buffer()
+    cfg = {"a": [1]}
+    dbg(cfg, [cfg, cfg["a"]], dedup=True)
+    _reset_stdout_stderr()
+
+    _assert_correct(
+        stdout.getvalue(),
+        "cfg = &1 {\n    a: &2 [\n        1\n    ]\n}\n[cfg, cfg['a']] = [\n    *1,\n    *2\n]",
+    )
+
+
+def test_dbg_rejects_invalid_options():
+    for options in (
+        {"sample_every": 0},
+        {"max_items": -1},
+        {"output_format": "xml"},
+        {"hexdump": -16},
+        {"dedup": 1},
+    ):
+        with pytest.raises(ValueError):
+            dbg(1, **options)
+
+
+def test_disable():
+    stdout, _ = _redirect_stdout_stderr_to_buffer()
+
+    disable()
+    try:
+        assert not is_enabled()
+        assert dbg() is None
+        assert dbg(1) == 1
+        assert dbg(1, 2) == (1, 2)
+    finally:
+        enable()
+    _reset_stdout_stderr()
+
+    assert is_enabled()
+    assert stdout.getvalue() == ""
+
+
+def _fail(*args, **kwargs):
+    raise AssertionError("dbg() is disabled, nothing should be looked at")
+
+
+def test_disabled_does_nothing(monkeypatch):
+    monkeypatch.setattr(crab_dbg._dbg, "_dbg", _fail)
+    monkeypatch.setattr(crab_dbg._dbg, "_get_call_site", _fail)
+    monkeypatch.setattr(crab_dbg._format, "_render", _fail)
+    disable()
+    try:
+        assert dbg([1]) == [1]
+    finally:
+        enable()
+
+
+def test_disabled_by_environment_variable():
+    code = (
+        "import crab_dbg._dbg\n"
+        "from crab_dbg import dbg, is_enabled\n"
+        "def _fail(*args):\n"
+        "    raise AssertionError('looked at')\n"
+        "crab_dbg._dbg._dbg = crab_dbg._dbg._get_call_site = _fail\n"
+        "assert not is_enabled()\n"
+        "assert dbg(1, 2) == (1, 2)\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        env={**os.environ, "CRAB_DBG_DISABLE": "1"},
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout == ""
+
+
+def test_sample_every():
+    stdout, _ = _redirect_stdout_stderr_to_buffer()
+
+    for i in range(10):
+        assert dbg(i, sample_every=4) == i
+    _reset_stdout_stderr()
+
+    _assert_correct(stdout.getvalue(), "i = 0\ni = 4\ni = 8")
+
+
+def test_sample_rate():
+    stdout, _ = _redirect_stdout_stderr_to_buffer()
+
+    for i in range(10):
+        dbg(i, sample_rate=0)
+    for i in range(3):
+        dbg(i, sample_rate=1)
+    _reset_stdout_stderr()
+
+    _assert_correct(stdout.getvalue(), "i = 0\ni = 1\ni = 2")
+
+
+def test_rate_limit(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(crab_dbg._sampling, "monotonic", lambda: now[0])
+    stdout, _ = _redirect_stdout_stderr_to_buffer()
+
+    for i in range(1000):
+        dbg(i, rate_limit=3)
+        if i == 499:
+            # A second later, 3 more calls are printed.
+            now[0] += 1.0
+    _reset_stdout_stderr()
+
+    _assert_correct(stdout.getvalue(), "i = 0\ni = 1\ni = 2\ni = 500\ni = 501\ni = 502")
+
+
+def test_sampling_summary():
+    sampler = crab_dbg._sampling.Sampler("[tests/test_dbg.py:1:1]")
+    for _ in range(10):
+        sampler.should_emit(5, None, None)
+
+    _, stderr = _redirect_stdout_stderr_to_buffer()
+    crab_dbg._sampling._print_summary()
+    _reset_stdout_stderr()
+
+    assert "[tests/test_dbg.py:1:1] suppressed 8 of 10 calls" in stderr.getvalue()
+
+
+def test_multiple_arguments_single_write():
+    class WriteRecorder(io.StringIO):
+        def __init__(self):
+            super().__init__()
+            self.writes = 0
+
+        def write(self, s):
+            self.writes += 1
+            return super().write(s)
+
+    file = WriteRecorder()
+    pi = 3.14
+    ultimate_answer = 42
+    dbg(pi, ultimate_answer, [1, 2], file=file)
+
+    assert file.writes == 1
+    _assert_correct(
+        file.getvalue(), "pi = 3.14\nultimate_answer = 42\n[1, 2] = [\n    1,\n    2\n]"
+    )
+
+
+def test_json_output():
+    file = io.StringIO()
+    pi = 3.14
+    dbg(pi, [1], np.arange(3), file=file, output_format="json")
+    dbg(file=file, output_format="json")
+
+    records = [json.loads(line) for line in file.getvalue().splitlines()]
+    assert len(records) == 4
+    for record in records:
+        assert record["file"] == "tests/test_dbg.py"
+        assert record["line"] > 0
+        assert record["col"] == 5
+        assert record["thread"] == "MainThread"
+        assert isinstance(record["ts"], float)
+    assert records[0]["line"] == records[1]["line"] == records[2]["line"]
+    assert records[3]["line"] == records[0]["line"] + 1
+    assert [(r["expr"], r["type"], r["value"]) for r in records[:3]] == [
+        ("pi", "float", "3.14"),
+        ("[1]", "list", "[\n    1\n]"),
+        ("np.arange(3)", "numpy.ndarray", "array([0, 1, 2])"),
+    ]
+    assert "expr" not in records[3]
+
+
+def test_json_output_configure():
+    configure(output_format="json")
+    try:
+        file = io.StringIO()
+        dbg(1, file=file)
+        assert json.loads(file.getvalue())["value"] == "1"
+    finally:
+        configure(output_format="text")
+
+    with pytest.raises(ValueError):
+        configure(output_format="xml")
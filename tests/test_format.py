@@ -0,0 +1,325 @@
+from collections import namedtuple
+from dataclasses import dataclass, field
+import gc
+import reprlib
+import sys
+import weakref
+
+import crab_dbg._format
+from crab_dbg._config import Options
+from crab_dbg import register, unregister
+from crab_dbg._format import get_human_readable_repr
+
+
+class Node:
+    def __init__(self, next_=None):
+        self.next = next_
+
+
+class Point:
+    def __init__(self, x, y, z):
+        self.x = x
+        self.y = y
+        self.z = z
+
+
+def test_deeply_nested_object():
+    depth = sys.getrecursionlimit() * 2
+    head = None
+    for _ in range(depth):
+        head = Node(head)
+
+    lines = get_human_readable_repr(head).split("\n")
+
+    assert len(lines) == 2 * depth + 1
+    assert lines[0] == "Node {"
+    assert lines[depth] == " " * 4 * depth + "next: None"
+    assert lines[-1] == "}"
+
+
+def test_deeply_nested_list():
+    depth = sys.getrecursionlimit() * 2
+    nested = []
+    for _ in range(depth):
+        nested = [nested]
+
+    lines = get_human_readable_repr(nested).split("\n")
+
+    assert lines[0] == "["
+    # The innermost, empty list.
+    assert lines[depth] == " " * 4 * depth + "["
+    assert lines[depth + 1] == ""
+    assert lines[-1] == "]"
+
+
+def test_empty_containers():
+    assert get_human_readable_repr([]) == "[\n\n]"
+    assert get_human_readable_repr({}) == "{\n\n}"
+    assert get_human_readable_repr([[]]) == "[\n    [\n\n    ]\n]"
+
+
+def test_max_items():
+    options = Options().override(max_items=2)
+
+    assert get_human_readable_repr(list(range(10)), options) == (
+        "[\n    0,\n    1,\n    ... 8 more items\n]"
+    )
+    assert get_human_readable_repr({"a": 1, "b": 2, "c": 3}, options) == (
+        "{\n    a: 1,\n    b: 2,\n    ... 1 more items\n}"
+    )
+    assert get_human_readable_repr(Point(1, 2, 3), options) == (
+        "Point {\n    x: 1\n    y: 2\n    ... 1 more fields\n}"
+    )
+    assert get_human_readable_repr([0] * 10_000_000, options).endswith(
+        "... 9,999,998 more items\n]"
+    )
+
+
+def test_max_depth():
+    options = Options().override(max_depth=1)
+
+    assert get_human_readable_repr(
+        [[1, 2], {"a": 1}, (1,), Point(1, 2, 3)], options
+    ) == (
+        "[\n    [... 2 items],\n    {... 1 items},\n    (... 1 items),\n    Point {... 3 fields}\n]"
+    )
+    assert (
+        get_human_readable_repr([1, 2], Options().override(max_depth=0))
+        == "[... 2 items]"
+    )
+
+
+def test_max_string():
+    options = Options().override(max_string=5)
+
+    assert (
+        get_human_readable_repr("a" * 100, options) == "'aaaaa'... 95 more characters"
+    )
+    assert (
+        get_human_readable_repr([10**20], options)
+        == "[\n    10000... 16 more characters\n]"
+    )
+    assert get_human_readable_repr("hi", options) == "'hi'"
+
+
+def test_type_dispatch_cache_follows_class_changes():
+    class Late:
+        def __init__(self):
+            self.a = 1
+
+    late = Late()
+    assert get_human_readable_repr(late) == "Late {\n    a: 1\n}"
+
+    Late.__repr__ = lambda self: "Late(a=%d)" % self.a
+    assert get_human_readable_repr(late) == "Late(a=1)"
+
+    del Late.__repr__
+    assert get_human_readable_repr(late) == "Late {\n    a: 1\n}"
+
+
+class Order:
+    def __init__(self, order_id, items):
+        self.order_id = order_id
+        self.items = items
+
+
+class PriorityOrder(Order):
+    pass
+
+
+def test_register_formatter():
+    register(
+        Order, lambda order: "Order #%d, %d items" % (order.order_id, len(order.items))
+    )
+    try:
+        assert get_human_readable_repr(Order(1, [1, 2])) == "Order #1, 2 items"
+        # Subclasses use the formatter of their closest registered base class.
+        assert (
+            get_human_readable_repr([PriorityOrder(2, [])])
+            == "[\n    Order #2, 0 items\n]"
+        )
+
+        @register(PriorityOrder)
+        def _format_priority_order(order):
+            return "Priority order #%d\nwith %d items" % (
+                order.order_id,
+                len(order.items),
+            )
+
+        assert get_human_readable_repr([PriorityOrder(3, [])]) == (
+            "[\n    Priority order #3\n    with 0 items\n]"
+        )
+    finally:
+        unregister(Order)
+        unregister(PriorityOrder)
+
+    assert (
+        get_human_readable_repr(Order(1, []))
+        == "Order {\n    order_id: 1\n    items: [\n\n    ]\n}"
+    )
+
+
+def test_register_by_name_as_block():
+    register(
+        "%s.Order" % __name__, lambda order: "Order\n#%d" % order.order_id, block=True
+    )
+    try:
+        assert get_human_readable_repr({"order": Order(1, [])}) == (
+            "{\n    order: \n        Order\n        #1\n}"
+        )
+    finally:
+        unregister("%s.Order" % __name__)
+
+
+def test_dedup_shared_references():
+    config = {"debug": True}
+    node = Node()
+    value = [config, [config], node, node]
+    assert get_human_readable_repr(value, Options().override(dedup=True)) == (
+        "[\n"
+        "    &1 {\n"
+        "        debug: True\n"
+        "    },\n"
+        "    [\n"
+        "        *1\n"
+        "    ],\n"
+        "    &2 Node {\n"
+        "        next: None\n"
+        "    },\n"
+        "    *2\n"
+        "]"
+    )
+    # Off by default.
+    assert "*1" not in get_human_readable_repr(value)
+
+
+def test_dedup_keeps_cyclic_references_and_limits():
+    cyclic = [1]
+    cyclic.append(cyclic)
+    assert get_human_readable_repr(cyclic, Options().override(dedup=True)) == (
+        "[\n    1,\n    [...]\n]"
+    )
+
+    # Collapsed containers are not rendered, nothing to refer to.
+    config = {"debug": True}
+    assert get_human_readable_repr(
+        [[config], config], Options().override(dedup=True, max_depth=2)
+    ) == (
+        "[\n    [\n        {... 1 items}\n    ],\n    {\n        debug: True\n    }\n]"
+    )
+
+
+class Slotted:
+    __slots__ = ("x", "__hidden", "unset")
+    kind = "slotted"
+
+    def __init__(self):
+        self.x = 1
+        self.__hidden = 2
+
+
+class SlottedChild(Slotted):
+    def __init__(self):
+        super().__init__()
+        self.extra = 3
+
+
+def test_slots():
+    assert get_human_readable_repr(Slotted()) == (
+        "Slotted {\n    x: 1\n    __hidden: 2\n    Slotted.kind: 'slotted'\n}"
+    )
+    assert get_human_readable_repr(SlottedChild()) == (
+        "SlottedChild {\n    extra: 3\n    x: 1\n    __hidden: 2\n}"
+    )
+
+
+@dataclass
+class Account:
+    name: str
+    password: str = field(repr=False, default="hunter2")
+    tags: list = field(default_factory=list)
+
+
+@dataclass
+class AccountWithRepr(Account):
+    def __repr__(self):
+        return "Account %s" % self.name
+
+
+@dataclass
+class AccountWithRecursiveRepr(Account):
+    @reprlib.recursive_repr()
+    def __repr__(self):
+        return "Account %s" % self.name
+
+
+Pair = namedtuple("Pair", "left right")
+
+
+def test_dataclasses_and_namedtuples():
+    assert get_human_readable_repr(Account("root", tags=["admin"])) == (
+        "Account {\n    name: 'root'\n    tags: [\n        'admin'\n    ]\n}"
+    )
+    # A handwritten __repr__ wins.
+    assert get_human_readable_repr(AccountWithRepr("root")) == "Account root"
+    # Also when it is wrapped, like the generated one.
+    assert get_human_readable_repr(AccountWithRecursiveRepr("root")) == "Account root"
+    assert get_human_readable_repr([Pair(1, (2,))]) == (
+        "[\n    Pair {\n        left: 1\n        right: (\n            2\n        )\n    }\n]"
+    )
+
+
+class _Attribute:
+    def __init__(self, name, repr=True):
+        self.name = name
+        self.repr = repr
+
+
+class AttrsLike:
+    """Like a class made by attrs with repr=False, attrs is not a dependency."""
+
+    __attrs_attrs__ = (_Attribute("id"), _Attribute("token", repr=False))
+
+    def __init__(self):
+        self.id = 7
+        self.token = "secret"
+        self.cache = {}
+
+
+def test_attrs_fields():
+    assert get_human_readable_repr(AttrsLike()) == "AttrsLike {\n    id: 7\n}"
+
+
+def test_class_variables_added_later():
+    class Late:
+        pass
+
+    late = Late()
+    assert get_human_readable_repr(late) == "Late {\n}"
+    Late.added = 1
+    assert get_human_readable_repr(late) == "Late {\n    Late.added: 1\n}"
+
+
+def test_deep_indents_are_not_cached():
+    head = None
+    for _ in range(200):
+        head = Node(head)
+    lines = get_human_readable_repr(head).splitlines()
+    assert lines[199] == " " * (4 * 199) + "next: Node {"
+    assert len(crab_dbg._format._INDENTS) == crab_dbg._format._CACHED_INDENT_LEVELS
+
+
+def test_type_caches_let_runtime_classes_go(monkeypatch):
+    monkeypatch.setattr(crab_dbg._format, "_TYPE_CACHE_MAX_SIZE", 8)
+    first = None
+    for i in range(20):
+        cls = namedtuple("Row%d" % i, "a")
+        get_human_readable_repr(type("Plain%d" % i, (), {"kind": i})())
+        get_human_readable_repr(cls(i))
+        if first is None:
+            first = weakref.ref(cls)
+        del cls
+    gc.collect()
+    assert len(crab_dbg._format._KINDS) <= 8
+    assert len(crab_dbg._format._CLASS_VARS) <= 8
+    assert first() is None
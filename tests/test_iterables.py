@@ -0,0 +1,73 @@
+from array import array
+from collections import OrderedDict, deque
+import io
+from itertools import count
+
+from crab_dbg import dbg
+from crab_dbg._config import Options
+from crab_dbg._format import get_human_readable_repr
+
+
+def test_iterables():
+    options = Options().override(preview_items=5)
+    assert get_human_readable_repr(deque([1, 2]), options) == (
+        "deque [\n    1,\n    2\n]"
+    )
+    assert get_human_readable_repr({"a": 1}.keys(), options) == (
+        "dict_keys [\n    'a'\n]"
+    )
+    assert get_human_readable_repr(OrderedDict(a=[1]).items(), options) == (
+        "odict_items {\n    a: [\n        1\n    ]\n}"
+    )
+    assert get_human_readable_repr(array("i", [3]), options) == (
+        "array('i') [\n    3\n]"
+    )
+    assert get_human_readable_repr(memoryview(b"a"), options) == (
+        "memoryview [\n    97\n]"
+    )
+    # range() has a short repr() of its own.
+    assert get_human_readable_repr(range(10**9), options) == "range(0, 1000000000)"
+
+
+def test_iterables_rendered_by_repr_by_default():
+    assert get_human_readable_repr(deque([1, 2])) == "deque([1, 2])"
+    assert get_human_readable_repr({"a": 1}.keys()) == "dict_keys(['a'])"
+    assert get_human_readable_repr(array("i", [3])) == "array('i', [3])"
+
+
+def test_iterable_limits():
+    values = deque(range(10**6))
+    assert get_human_readable_repr(values, Options().override(preview_items=2)) == (
+        "deque [\n    0,\n    1,\n    ... 999,998 more items\n]"
+    )
+    assert get_human_readable_repr(
+        values, Options().override(preview_items=3, max_items=1)
+    ) == ("deque [\n    0,\n    ... 999,999 more items\n]")
+    assert get_human_readable_repr(
+        [values], Options().override(preview_items=2, max_depth=1)
+    ) == ("[\n    deque [... 1,000,000 items]\n]")
+
+
+def test_iterator_preview():
+    file = io.StringIO()
+    squares = dbg((i * i for i in range(5)), file=file, preview_items=2)
+    assert file.getvalue().endswith(
+        " = generator [\n    0,\n    1,\n    ... more items\n]\n"
+    )
+    # Nothing is lost.
+    assert list(squares) == [0, 1, 4, 9, 16]
+
+    file = io.StringIO()
+    numbers, letters = dbg(count(), iter("ab"), file=file, preview_items=2)
+    assert next(numbers) == 0
+    assert list(letters) == ["a", "b"]
+    # All items of the second iterator are known.
+    assert file.getvalue().endswith(" = str_ascii_iterator [\n    'a',\n    'b'\n]\n")
+
+
+def test_iterators_are_left_alone_by_default():
+    squares = (i * i for i in range(5))
+    file = io.StringIO()
+    assert dbg(squares, file=file) is squares
+    assert "<generator object" in file.getvalue()
+    assert list(squares) == [0, 1, 4, 9, 16]
@@ -0,0 +1,87 @@
+from dataclasses import dataclass
+from enum import Enum
+
+from crab_dbg import clear_render_cache, register, render_cache_info, unregister
+from crab_dbg._config import Options
+from crab_dbg._format import get_human_readable_repr
+from crab_dbg._memo import is_immutable
+
+
+class Color(Enum):
+    RED = 1
+
+
+@dataclass(frozen=True)
+class Limits:
+    low: int
+    high: tuple
+
+
+@dataclass
+class Mutable:
+    value: int
+
+
+def _memoized(obj) -> str:
+    return get_human_readable_repr(obj, Options().override(memoize=True))
+
+
+def test_is_immutable():
+    assert is_immutable((1, "a", (2.0, None), frozenset({b"x"})))
+    assert is_immutable(Color.RED)
+    assert is_immutable(Limits(1, (2, 3)))
+    assert not is_immutable((1, [2]))
+    assert not is_immutable(Limits(1, ([2],)))
+    assert not is_immutable(Mutable(1))
+
+
+def test_memoized_rendering_is_reused():
+    clear_render_cache()
+    table = tuple("name_%d" % i for i in range(100))
+    value = {"table": table, "nested": [table]}
+
+    assert _memoized(value) == get_human_readable_repr(value)
+    info = render_cache_info()
+    # Indented differently at each place, so rendered twice.
+    assert (info.hits, info.misses, info.currsize) == (0, 2, 2)
+
+    assert _memoized(value) == get_human_readable_repr(value)
+    info = render_cache_info()
+    assert (info.hits, info.misses) == (2, 2)
+
+
+def test_mutable_values_are_not_memoized():
+    clear_render_cache()
+    items = [0]
+    value = tuple([items] * 20)
+    _memoized(value)
+    items.append(1)
+    # The tuple holds a list, which has changed since.
+    assert _memoized(value) == get_human_readable_repr(value)
+    assert "1" in _memoized(value)
+
+
+def test_memo_follows_options_and_registry():
+    clear_render_cache()
+    table = tuple(range(100))
+    assert (
+        get_human_readable_repr(table, Options().override(memoize=True, max_items=1))
+        == "(\n    0,\n    ... 99 more items\n)"
+    )
+    assert _memoized(table) == get_human_readable_repr(table)
+
+    register(tuple, lambda t: "tuple of %d" % len(t))
+    try:
+        assert _memoized(table) == "tuple of 100"
+    finally:
+        unregister(tuple)
+    assert _memoized(table) == get_human_readable_repr(table)
+
+
+def test_memo_size():
+    clear_render_cache()
+    options = Options().override(memoize=True, memo_size=2)
+    tables = [tuple(range(i, i + 20)) for i in range(3)]
+    for table in tables:
+        get_human_readable_repr(table, options)
+    assert render_cache_info().currsize == 2
@@ -0,0 +1,208 @@
+import asyncio
+import io
+import re
+import threading
+import time
+
+from crab_dbg import configure, dbg
+from crab_dbg._output import (
+    BackgroundWriter,
+    ChunkedWriter,
+    flush_background_writer,
+    get_background_writer,
+    stop_background_writer,
+)
+
+
+def test_chunked_writer():
+    chunks = []
+    writer = ChunkedWriter(chunks.append, chunk_size=4)
+    for fragment in ["a", "bc", "d", "e", "fghij", "k"]:
+        writer.write(fragment)
+    writer.flush()
+
+    assert chunks == ["abcd", "efghij", "k"]
+
+
+def test_background_writer():
+    file = io.StringIO()
+    configure(background=True)
+    try:
+        for i in range(100):
+            dbg(i, file=file)
+        flush_background_writer()
+    finally:
+        configure(background=False)
+        stop_background_writer()
+
+    lines = file.getvalue().splitlines()
+    assert len(lines) == 100
+    assert all(line.endswith("] i = %d" % i) for i, line in enumerate(lines))
+
+
+class BlockingFile(io.StringIO):
+    """A file whose writes are blocked until it is unblocked."""
+
+    def __init__(self):
+        super().__init__()
+        self.unblocked = threading.Event()
+
+    def write(self, s):
+        self.unblocked.wait()
+        return super().write(s)
+
+
+def test_background_writer_drop_when_full():
+    file = BlockingFile()
+    writer = BackgroundWriter(queue_size=2, overflow="drop")
+    for i in range(10):
+        writer.put(file, "%d\n" % i, False)
+    file.unblocked.set()
+    writer.close()
+
+    # The writer thread may have taken the first record off the queue before it is full.
+    assert writer.dropped in (7, 8)
+    assert len(file.getvalue().splitlines()) == 10 - writer.dropped
+
+
+def test_background_writer_batches_writes():
+    file = BlockingFile()
+    writes = []
+    write = file.write
+    file.write = lambda s: writes.append(s) or write(s)
+    writer = BackgroundWriter(queue_size=100, overflow="block")
+    for i in range(50):
+        writer.put(file, "%d\n" % i, False)
+    file.unblocked.set()
+    writer.close()
+
+    assert file.getvalue() == "".join("%d\n" % i for i in range(50))
+    assert len(writes) < 50
+
+
+def test_background_writer_rejects_records_once_closed():
+    file = io.StringIO()
+    writer = BackgroundWriter(queue_size=2, overflow="block")
+    assert writer.put(file, "1\n", False)
+    writer.close()
+    assert not writer.put(file, "2\n", False)
+    writer.flush()
+    assert file.getvalue() == "1\n"
+
+
+def test_background_writer_replaced_while_in_use():
+    file = BlockingFile()
+    configure(background=True, queue_size=2)
+    try:
+        old_writer = get_background_writer(2, "block")
+        # Fill the queue, the next dbg() call waits for a free slot.
+        for i in range(4):
+            old_writer.put(file, "%d\n" % i, False)
+        thread = threading.Thread(target=lambda: dbg(4, file=file))
+        thread.start()
+        replacer = threading.Thread(
+            target=lambda: configure(queue_size=3) or dbg(5, file=file)
+        )
+        replacer.start()
+        file.unblocked.set()
+        thread.join()
+        replacer.join()
+        flush_background_writer()
+    finally:
+        configure(background=False, queue_size=10000)
+        stop_background_writer()
+
+    lines = file.getvalue().splitlines()
+    assert lines[:4] == ["0", "1", "2", "3"]
+    assert sorted(line.rsplit(" ", 1)[1] for line in lines[4:]) == ["4", "5"]
+
+
+def test_background_writer_closed_while_waiting_for_a_slot():
+    file = BlockingFile()
+    writer = BackgroundWriter(queue_size=1, overflow="block")
+    writer.put(file, "0\n", False)
+    # Wait until the writer thread is blocked writing the first record, then fill the queue.
+    while not writer._queue.empty():
+        time.sleep(0.001)
+    writer.put(file, "1\n", False)
+    results = []
+    producer = threading.Thread(
+        target=lambda: results.append(writer.put(file, "2\n", False))
+    )
+    producer.start()
+    closer = threading.Thread(target=writer.close)
+    closer.start()
+    # The waiting producer doesn't hold up close().
+    deadline = time.monotonic() + 5
+    while not writer.closed and time.monotonic() < deadline:
+        time.sleep(0.001)
+    assert writer.closed
+    file.unblocked.set()
+    producer.join()
+    closer.join()
+
+    assert results == [False]
+    assert file.getvalue() == "0\n1\n"
+
+
+def test_get_background_writer_replaced_once():
+    get_background_writer(2, "block")
+    barrier = threading.Barrier(4)
+    writers = []
+
+    def worker():
+        barrier.wait()
+        writers.append(get_background_writer(3, "block"))
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        stop_background_writer()
+
+    assert len(writers) == 4
+    assert all(writer is writers[0] for writer in writers)
+
+
+def test_context_tags():
+    file = io.StringIO()
+    configure(show_thread=True, show_task=True, show_time=True)
+    try:
+        dbg(1, file=file)
+
+        async def main():
+            asyncio.current_task().set_name("worker")
+            dbg(2, file=file)
+
+        asyncio.run(main())
+    finally:
+        configure(show_thread=False, show_task=False, show_time=False)
+
+    lines = file.getvalue().splitlines()
+    assert re.search(r"\] \[thread=MainThread t=\d+\.\d{6}\] 1 = 1$", lines[0])
+    assert re.search(
+        r"\] \[thread=MainThread task=worker t=\d+\.\d{6}\] 2 = 2$", lines[1]
+    )
+
+
+def test_concurrent_output_not_interleaved():
+    file = io.StringIO()
+    large_list = list(range(100))
+
+    def worker():
+        for _ in range(20):
+            dbg(large_list, file=file)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    outputs = file.getvalue().split("] large_list = ")
+    assert len(outputs) == 4 * 20 + 1
+    expected_output = "[\n" + ",\n".join("    %d" % i for i in range(100)) + "\n]\n"
+    assert all(output.startswith(expected_output) for output in outputs[1:])
@@ -0,0 +1,109 @@
+import io
+import linecache
+import os
+import sys
+
+import crab_dbg._source
+from crab_dbg import clear_source_cache, dbg, source_cache_info
+from crab_dbg._source import _SourceCache, get_dbg_raw_args
+
+
+def test_source_cache_hits_and_misses(tmp_path):
+    source_file = tmp_path / "module.py"
+    source_file.write_text("a = 1\nb = 2\n")
+    frame = sys._getframe()
+    cache = _SourceCache(maxsize=1024)
+
+    assert cache.get_lines(str(source_file), frame) == ["a = 1\n", "b = 2\n"]
+    assert cache.get_lines(str(source_file), frame) == ["a = 1\n", "b = 2\n"]
+    info = cache.cache_info()
+    assert (info.hits, info.misses, info.currsize) == (1, 1, 12)
+
+    # Modified files are read again.
+    source_file.write_text("a = 3\nb = 4\n")
+    mtime_ns = source_file.stat().st_mtime_ns + 10**9
+    os.utime(source_file, ns=(mtime_ns, mtime_ns))
+    assert cache.get_lines(str(source_file), frame) == ["a = 3\n", "b = 4\n"]
+    info = cache.cache_info()
+    assert (info.hits, info.misses, info.currsize) == (1, 2, 12)
+
+
+def test_source_cache_stat_throttled(tmp_path, monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(crab_dbg._source, "monotonic", lambda: now[0])
+    source_file = tmp_path / "module.py"
+    source_file.write_text("a = 1\n")
+    cache = _SourceCache(maxsize=1024)
+    source_stat = cache.stat(str(source_file))
+
+    source_file.write_text("a = 10\n")
+    assert cache.stat(str(source_file)) == source_stat
+    assert cache.stat(str(source_file), 0) != source_stat
+    now[0] += cache.STAT_INTERVAL
+    assert cache.stat(str(source_file)) == (source_file.stat().st_mtime_ns, 7)
+
+
+def test_source_cache_lru_eviction(tmp_path):
+    frame = sys._getframe()
+    cache = _SourceCache(maxsize=20)
+    filenames = []
+    for i in range(3):
+        source_file = tmp_path / ("module_%d.py" % i)
+        source_file.write_text("x = %d\n" % i)
+        filenames.append(str(source_file))
+
+    cache.get_lines(filenames[0], frame)
+    cache.get_lines(filenames[1], frame)
+    cache.get_lines(filenames[0], frame)
+    # Only room for 3 files of 6 bytes, so the least recently used one goes.
+    cache.get_lines(filenames[2], frame)
+    cache.get_lines(filenames[1], frame)
+    cache.get_lines(filenames[1], frame)
+
+    info = cache.cache_info()
+    assert info.currsize <= info.maxsize
+    assert (info.hits, info.misses) == (3, 3)
+
+
+def test_source_from_linecache():
+    # Code without a source file, like those typed into an interactive shell, can still be debugged as long as
+    # linecache knows about it.
+    filename = "<crab_dbg test input>"
+    source = "answer = 42\ndbg(answer)\n"
+    linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+    stdout = io.StringIO()
+    sys.stdout = stdout
+    try:
+        exec(compile(source, filename, "exec"), {"dbg": dbg})
+    finally:
+        sys.stdout = sys.__stdout__
+        del linecache.cache[filename]
+
+    assert stdout.getvalue().endswith("] answer = 42\n")
+
+
+def test_public_source_cache_info():
+    clear_source_cache()
+    stdout = io.StringIO()
+    sys.stdout = stdout
+    try:
+        for i in range(2):
+            dbg(i)
+    finally:
+        sys.stdout = sys.__stdout__
+
+    # The second call is served by the call site cache, without looking for source code at all.
+    info = source_cache_info()
+    assert info.hits + info.misses == 1
+
+
+def test_get_dbg_raw_args_multiline():
+    source_lines = ["x = dbg(\n", "    a,  # comment\n", "    b + 1,\n", ")\n"]
+
+    class Positions:
+        lineno = 1
+        end_lineno = 4
+        col_offset = 4
+        end_col_offset = 1
+
+    assert get_dbg_raw_args(source_lines, Positions) == ["a", "b + 1"]
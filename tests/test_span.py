@@ -0,0 +1,138 @@
+import asyncio
+import io
+import json
+import re
+import threading
+import time
+
+import pytest
+
+from crab_dbg import configure, dbg, disable, enable
+
+_TIMING_RE = re.compile(r" took \d+\.\d{3} [mu]s, cpu \d+\.\d{3} [mu]s$")
+
+
+def _lines(file: io.StringIO) -> list[str]:
+    """Output lines without their timings, which are checked here."""
+    lines = []
+    for line in file.getvalue().splitlines():
+        if line.startswith("[tests/test_span.py:"):
+            line = line.split("] ", 1)[1]
+        if _TIMING_RE.search(line):
+            line = _TIMING_RE.sub(" took ...", line)
+        lines.append(line)
+    return lines
+
+
+def test_span():
+    file = io.StringIO()
+    with dbg.span("outer", file=file):
+        with dbg.span("inner", file=file):
+            pass
+        with pytest.raises(KeyError):
+            with dbg.span("failing", file=file):
+                raise KeyError
+    assert _lines(file) == [
+        "outer > inner took ...",
+        "outer > failing raised KeyError took ...",
+        "outer took ...",
+    ]
+
+
+def test_trace():
+    file = io.StringIO()
+
+    @dbg.trace(file=file)
+    def scale(values, factor=1):
+        return [value * factor for value in values]
+
+    @dbg.trace(file=file)
+    def fail():
+        raise ValueError("no")
+
+    with dbg.span("batch", file=file):
+        assert scale([1], factor=2) == [2]
+    with pytest.raises(ValueError):
+        fail()
+    assert _lines(file) == [
+        "batch > test_trace.<locals>.scale([",
+        "    1",
+        "], factor=2) = [",
+        "    2",
+        "] took ...",
+        "batch took ...",
+        "test_trace.<locals>.fail() raised ValueError took ...",
+    ]
+    assert scale.__name__ == "scale"
+
+
+def test_trace_coroutine():
+    file = io.StringIO()
+
+    @dbg.trace(file=file)
+    async def fetch(key):
+        with dbg.span("sleep", file=file):
+            await asyncio.sleep(0)
+        return key
+
+    assert asyncio.run(fetch("k")) == "k"
+    assert _lines(file) == [
+        "test_trace_coroutine.<locals>.fetch > sleep took ...",
+        "test_trace_coroutine.<locals>.fetch('k') = 'k' took ...",
+    ]
+
+
+def test_span_json():
+    file = io.StringIO()
+    configure(output_format="json")
+    try:
+        with dbg.span("outer", file=file):
+            with dbg.span("inner", file=file):
+                pass
+    finally:
+        configure(output_format="text")
+    inner, outer = [json.loads(line) for line in file.getvalue().splitlines()]
+    assert inner["file"] == "tests/test_span.py"
+    assert (inner["span"], inner["parents"]) == ("inner", ["outer"])
+    assert (outer["span"], outer["parents"]) == ("outer", [])
+    assert 0 <= inner["wall_ns"] <= outer["wall_ns"]
+
+
+def test_cpu_time_of_calling_thread_only():
+    file = io.StringIO()
+    done = threading.Event()
+
+    def _spin():
+        while not done.is_set():
+            pass
+
+    spinner = threading.Thread(target=_spin)
+    spinner.start()
+    configure(output_format="json")
+    try:
+        with dbg.span("sleep", file=file):
+            time.sleep(0.2)
+    finally:
+        configure(output_format="text")
+        done.set()
+        spinner.join()
+    (record,) = [json.loads(line) for line in file.getvalue().splitlines()]
+    assert record["wall_ns"] >= 200_000_000
+    # The spinning thread is left out.
+    assert record["cpu_ns"] < 50_000_000
+
+
+def test_disabled():
+    file = io.StringIO()
+
+    @dbg.trace(file=file)
+    def double(value):
+        return value * 2
+
+    disable()
+    try:
+        with dbg.span("off", file=file):
+            assert double(2) == 4
+    finally:
+        enable()
+    assert file.getvalue() == ""
@@ -0,0 +1,86 @@
+import io
+import sys
+
+import crab_dbg._dbg
+from crab_dbg import configure, dbg, reset_stats, stats
+from crab_dbg._stats import SiteProfile, _print_report
+
+
+def _profiled_calls(count: int) -> None:
+    file = io.StringIO()
+    configure(profile=True)
+    try:
+        for i in range(count):
+            dbg(i, file=file)
+    finally:
+        configure(profile=False)
+
+
+def test_stats():
+    reset_stats()
+    _profiled_calls(3)
+    (site,) = [site for site in stats() if site.calls]
+    assert site.location.startswith("[tests/test_stats.py:")
+    assert site.calls == 3
+    # The call site is parsed once only.
+    assert site.stages["parse"].count == 1
+    for name in ("source", "render", "write"):
+        stage = site.stages[name]
+        assert stage.count == 3
+        assert 0 < stage.max_ns <= stage.total_ns
+        assert sum(count for _, count in stage.histogram) == 3
+    assert site.total_ns == sum(stage.total_ns for stage in site.stages.values())
+
+    reset_stats()
+    assert all(site.calls == 0 for site in stats())
+
+
+def test_stats_off_by_default():
+    reset_stats()
+    dbg(1, file=io.StringIO())
+    assert all(site.calls == 0 for site in stats())
+
+
+def test_profile_turned_on_during_a_call(monkeypatch):
+    get_call_site = crab_dbg._dbg._get_call_site
+
+    def _get_call_site_turning_profile_on(frame):
+        # As if another thread turned profiling on meanwhile.
+        configure(profile=True)
+        return get_call_site(frame)
+
+    monkeypatch.setattr(
+        crab_dbg._dbg, "_get_call_site", _get_call_site_turning_profile_on
+    )
+    file = io.StringIO()
+    try:
+        assert dbg(1, file=file) == 1
+    finally:
+        configure(profile=False)
+    assert file.getvalue().endswith("] 1 = 1\n")
+
+
+def test_histogram():
+    profile = SiteProfile("[main.py:1:1]")
+    for duration in (1, 700, 1000, 1024):
+        profile.add(0, duration)
+    assert profile.snapshot().stages["source"].histogram == (
+        (2, 1),
+        (1024, 2),
+        (2048, 1),
+    )
+
+
+def test_report_at_exit():
+    reset_stats()
+    _profiled_calls(2)
+    stderr = io.StringIO()
+    sys.stderr = stderr
+    try:
+        _print_report()
+    finally:
+        sys.stderr = sys.__stderr__
+    (line,) = stderr.getvalue().splitlines()
+    assert line.startswith("crab_dbg: [tests/test_stats.py:")
+    assert " 2 calls took " in line
+    assert ", render " in line and ", write " in line
@@ -0,0 +1,88 @@
+import io
+import json
+
+import pytest
+
+from crab_dbg import configure, dbg
+from crab_dbg._watch import Watcher
+
+
+def _outputs(file: io.StringIO) -> list[str]:
+    """Output without the locations."""
+    return [
+        line.split("] ", 1)[1] if line.startswith("[tests/test_watch.py:") else line
+        for line in file.getvalue().splitlines()
+    ]
+
+
+def test_watcher():
+    watcher = Watcher()
+    assert watcher.changes(["1", "a"], False) == [("1", False), ("a", False)]
+    assert watcher.changes(["1", "a"], False) == [None, None]
+    assert watcher.changes(["2", "a"], False) == [("2", False), None]
+    # Without the previous text, there is nothing to diff against.
+    assert watcher.changes(["3", "a"], True) == [("3", False), None]
+    assert watcher.changes(["[\n    1\n]", "a"], True) == [
+        ("@@ -1 +1,3 @@\n-3\n+[\n+    1\n+]", True),
+        None,
+    ]
+
+
+def test_changed_only():
+    file = io.StringIO()
+    state = {"count": 0}
+    for i in range(4):
+        if i == 2:
+            state["count"] = 1
+        assert dbg(state, changed_only=True, file=file) is state
+    assert _outputs(file) == [
+        "state = {",
+        "    count: 0",
+        "}",
+        "state = {",
+        "    count: 1",
+        "}",
+    ]
+
+
+def test_watch_with_diff():
+    file = io.StringIO()
+    state = {"count": 0, "name": "poller"}
+    for i in range(3):
+        if i == 2:
+            state["count"] = 1
+        assert dbg.watch(state, "steady", diff=True, file=file) == (state, "steady")
+    assert _outputs(file) == [
+        "state = {",
+        "    count: 0,",
+        "    name: 'poller'",
+        "}",
+        "'steady' = 'steady'",
+        "state changed:",
+        "@@ -1,3 +1,3 @@",
+        " {",
+        "-    count: 0,",
+        "+    count: 1,",
+        "     name: 'poller'",
+    ]
+
+
+def test_watch_json():
+    file = io.StringIO()
+    configure(output_format="json")
+    try:
+        for i in range(3):
+            dbg.watch(i // 2, "steady", file=file)
+    finally:
+        configure(output_format="text")
+    records = [json.loads(line) for line in file.getvalue().splitlines()]
+    assert [(record["expr"], record["value"]) for record in records] == [
+        ("i // 2", "0"),
+        ("'steady'", "'steady'"),
+        ("i // 2", "1"),
+    ]
+
+
+def test_watch_rejects_unknown_options():
+    with pytest.raises(TypeError):
+        dbg.watch(1, changed=True)